@@ -2,13 +2,14 @@ import pyautogui
 import re
 import time
 import os
-import threading
-import pywhatkit
+import shlex
+import subprocess
 
 # Import AppOpener functions
 from AppOpener import open as open_app
 from AppOpener import close as close_app
-from AppOpener import give_appnames
+from intents import IntentRouter
+from app_catalog import AppCatalog
 
 class ActionHandler:
     def __init__(self):
@@ -22,98 +23,120 @@ class ActionHandler:
             "obs": r"C:\Program Files\obs-studio\bin\64bit\obs64.exe"
         }
 
+        # Installed apps: loaded from the saved index, refreshed in the background
+        self.catalog = AppCatalog()
+        for name, path in self.custom_apps.items():
+            self.catalog.add_custom(name, path)
+        self.catalog.rescan_async()
+
+        # All commands are matched in one pass by a compiled intent table (intents.py)
+        self.router = IntentRouter()
+        self.handlers = {
+            "scan_apps": self.scan_apps,
+            "play_video": self.play_video,
+            "write_note": self.write_note,
+            "volume_up": self.volume_up,
+            "volume_down": self.volume_down,
+            "mute": self.mute,
+            "open_app": self.open_app,
+            "close_app": self.close_app,
+        }
+
     def execute(self, text):
-        if not text: return
-        text = text.lower().strip()
-
-        # =========================================================
-        # 0. SPECIAL COMMAND: UPDATE APP LIST
-        # =========================================================
-        if "scan apps" in text or "update apps" in text:
-            print("[ACTION] Scanning for new apps...")
-            # Run this in a thread so it doesn't freeze MARIE
-            threading.Thread(target=give_appnames, daemon=True).start()
-            return
-
-        # =========================================================
-        # 1. YOUTUBE (Play Video)
-        # =========================================================
-        if text.startswith("play "):
-            video_topic = text.replace("play ", "").replace("please", "").strip()
-            print(f"[ACTION] Playing on YouTube: {video_topic}")
+        """Runs the command in `text`, if it is one. Returns the Intent (or None)."""
+        intent = self.router.route(text)
+        if intent is None:
+            return None
+        self.handlers[intent.name](**intent.slots)
+        return intent
+
+    # =========================================================
+    # 0. SPECIAL COMMAND: UPDATE APP LIST
+    # =========================================================
+    def scan_apps(self):
+        print("[ACTION] Scanning for new apps...")
+        # Incremental (only new/changed shortcuts) and off-thread so it doesn't freeze MARIE
+        self.catalog.rescan_async()
+
+    # =========================================================
+    # 1. YOUTUBE (Play Video)
+    # =========================================================
+    def play_video(self, query):
+        print(f"[ACTION] Playing on YouTube: {query}")
+        try:
+            # Imported here: pywhatkit checks the internet connection on import
+            import pywhatkit
+            pywhatkit.playonyt(query)
+        except Exception as e:
+            print(f"[ERROR] YouTube failed: {e}")
+
+    # =========================================================
+    # 2. NOTEPAD (Write text)
+    # =========================================================
+    def write_note(self, content):
+        print(f"[ACTION] Writing to Notepad: {content}")
+        os.system("start notepad") 
+        time.sleep(1.0) # Wait for it to open
+        pyautogui.write(content, interval=0.05)
+
+    # =========================================================
+    # 3. SYSTEM CONTROLS
+    # =========================================================
+    def volume_up(self):
+        pyautogui.press('volumeup')
+
+    def volume_down(self):
+        pyautogui.press('volumedown')
+
+    def mute(self):
+        pyautogui.press('volumemute')
+
+    # =========================================================
+    # 4. OPEN APPS (Custom + General)
+    # =========================================================
+    def open_app(self, app):
+        app_name = re.sub(r'[^\w\s]', '', app).strip()
+
+        print(f"[ACTION] Opening: '{app_name}'")
+
+        # A. Catalog lookup (custom games/portable apps + scanned shortcuts)
+        entry = self.catalog.lookup(app_name)
+        if entry:
+            print(f"[ACTION] Found '{entry.name}' ({entry.source})")
             try:
-                pywhatkit.playonyt(video_topic)
+                self.launch(entry)
+                return
             except Exception as e:
-                print(f"[ERROR] YouTube failed: {e}")
-            return
-
-        # =========================================================
-        # 2. NOTEPAD (Write text)
-        # =========================================================
-        write_triggers = ["write ", "note ", "type ", "take a note "]
-        triggered_word = next((w for w in write_triggers if text.startswith(w)), None)
-
-        if triggered_word:
-            content = text.replace(triggered_word, "").strip()
-            print(f"[ACTION] Writing to Notepad: {content}")
-            os.system("start notepad") 
-            time.sleep(1.0) # Wait for it to open
-            pyautogui.write(content, interval=0.05)
-            return
-
-        # =========================================================
-        # 3. SYSTEM CONTROLS
-        # =========================================================
-        if "volume up" in text:
-            pyautogui.press('volumeup')
-            return
-        elif "volume down" in text:
-            pyautogui.press('volumedown')
-            return
-        elif "mute" in text or "unmute" in text:
-            pyautogui.press('volumemute')
-            return
-
-        # =========================================================
-        # 4. OPEN APPS (Custom + General)
-        # =========================================================
-        if text.startswith("open "):
-            raw_name = text.replace("open ", "").strip()
-            app_name = raw_name.replace("please", "").replace("now", "").strip()
-            app_name = re.sub(r'[^\w\s]', '', app_name)
-
-            print(f"[ACTION] Opening: '{app_name}'")
-
-            # A. Check Custom List first (Games/Portable)
-            for key, path in self.custom_apps.items():
-                if key in app_name:
-                    print(f"[ACTION] Found custom path for {key}")
-                    try:
-                        os.startfile(path)
-                    except Exception as e:
-                        print(f"[ERROR] Custom path failed: {e}")
-                    return
-
-            # B. Check General List (AppOpener)
-            try:
-                open_app(app_name, match_closest=True, output=False, throw_error=True)
-            except:
-                # C. Last Resort: Windows Start
-                try:
-                    os.system(f"start {app_name}")
-                except:
-                    print(f"[ERROR] Could not open '{app_name}'")
-            return
-
-        # =========================================================
-        # 5. CLOSE APPS
-        # =========================================================
-        if text.startswith("close "):
-            app_name = text.replace("close ", "").replace("please", "").strip()
-            app_name = re.sub(r'[^\w\s]', '', app_name)
-            
+                print(f"[ERROR] Launching {entry.path} failed: {e}")
+
+        # B. Check General List (AppOpener)
+        try:
+            open_app(app_name, match_closest=True, output=False, throw_error=True)
+        except:
+            # C. Last Resort: Windows Start
             try:
-                close_app(app_name, match_closest=True, output=False, throw_error=True)
+                os.system(f"start {app_name}")
             except:
-                print(f"[ERROR] Could not close '{app_name}'")
-            return
\ No newline at end of file
+                print(f"[ERROR] Could not open '{app_name}'")
+
+    def launch(self, entry):
+        if entry.command and os.name != "nt":
+            subprocess.Popen(shlex.split(entry.command), start_new_session=True,
+                             stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        else:
+            os.startfile(entry.path)
+
+    # =========================================================
+    # 5. CLOSE APPS
+    # =========================================================
+    def close_app(self, app):
+        app_name = re.sub(r'[^\w\s]', '', app).strip()
+        # AppOpener matches against its own names; give it the catalog's spelling
+        entry = self.catalog.lookup(app_name)
+        if entry:
+            app_name = entry.name
+
+        try:
+            close_app(app_name, match_closest=True, output=False, throw_error=True)
+        except:
+            print(f"[ERROR] Could not close '{app_name}'")
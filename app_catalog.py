@@ -0,0 +1,292 @@
+import os
+import re
+import sys
+import json
+import heapq
+import shlex
+import threading
+from collections import Counter, namedtuple
+
+INDEX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "app_catalog.json")
+APP_EXTENSIONS = (".lnk", ".exe", ".desktop", ".url")
+
+# Lookup tuning: how many trigram candidates get an edit-distance check, the
+# trigram overlap (Jaccard) a candidate needs to get one, and the lowest
+# similarity (0..1) that still counts as a match
+MAX_CANDIDATES = 8
+MIN_OVERLAP = 0.2
+MIN_SCORE = 0.6
+
+# name: display name, aliases: other spellings, path: what gets launched
+# (shortcut, exe or .desktop file), command: Exec line for .desktop entries
+AppEntry = namedtuple("AppEntry", ["name", "aliases", "path", "command", "source"])
+
+# .desktop Exec field codes (%f, %U, ...) are placeholders for files/URLs
+FIELD_CODE = re.compile(r"\s*%[fFuUdDnNickvm]")
+
+
+def default_roots():
+    if os.name == "nt":
+        roots = [
+            os.path.join(os.environ.get("ProgramData", r"C:\ProgramData"), r"Microsoft\Windows\Start Menu\Programs"),
+            os.path.join(os.environ.get("APPDATA", ""), r"Microsoft\Windows\Start Menu\Programs"),
+            os.path.join(os.path.expanduser("~"), "Desktop"),
+        ]
+    else:
+        roots = [
+            "/usr/share/applications",
+            "/usr/local/share/applications",
+            os.path.expanduser("~/.local/share/applications"),
+        ]
+    return [r for r in roots if os.path.isdir(r)]
+
+
+def normalize(name):
+    return " ".join(re.sub(r"[^\w\s]", " ", name.lower()).split())
+
+
+def trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a, b):
+    """Levenshtein distance, two rows at a time."""
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        previous = current
+    return previous[-1]
+
+
+def _name_aliases(stem):
+    """Extra spellings of a file-derived name: "obs64" -> "obs", "GenshinImpact" -> "genshin impact"."""
+    aliases = set()
+    spaced = re.sub(r"(?<=[a-z])(?=[A-Z])", " ", stem)
+    if spaced != stem:
+        aliases.add(spaced)
+    stripped = re.sub(r"(?:\s*(?:x?64|x86|32)(?:bit)?)$", "", stem, flags=re.I)
+    if stripped and stripped != stem:
+        aliases.add(stripped)
+    return aliases
+
+
+def parse_desktop_file(path):
+    """Reads a freedesktop .desktop file. Returns an AppEntry, or None if it is not a visible app."""
+    fields = {}
+    in_entry = False
+    with open(path, encoding="utf-8", errors="replace") as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith("["):
+                in_entry = line == "[Desktop Entry]"
+                continue
+            if in_entry and "=" in line and not line.startswith("#"):
+                key, value = line.split("=", 1)
+                fields.setdefault(key.strip(), value.strip())
+
+    if fields.get("Type", "Application") != "Application":
+        return None
+    if fields.get("NoDisplay", "").lower() == "true" or fields.get("Hidden", "").lower() == "true":
+        return None
+    name = fields.get("Name")
+    if not name:
+        return None
+
+    aliases = {fields.get("GenericName", "")}
+    aliases.update(k for k in fields.get("Keywords", "").split(";"))
+    command = FIELD_CODE.sub("", fields.get("Exec", "")).strip()
+    argv = shlex.split(command) if command else []
+    if argv:
+        aliases.add(os.path.basename(argv[0]))
+    aliases = sorted(a for a in aliases if a and normalize(a) != normalize(name))
+    return AppEntry(name, aliases, path, command, "desktop")
+
+
+def parse_app_file(path):
+    """Turns one file under a scan root into an AppEntry (or None)."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".desktop":
+        return parse_desktop_file(path)
+    stem = os.path.splitext(os.path.basename(path))[0]
+    # Start Menu folders are full of these
+    if re.search(r"\b(?:uninstall|readme|help|documentation)\b", stem, re.I):
+        return None
+    return AppEntry(stem, sorted(_name_aliases(stem)), path, None, ext.lstrip("."))
+
+
+class AppCatalog:
+    """Persisted, fuzzy-searchable index of installed apps.
+
+    Entries come from Start Menu shortcuts / desktop files under `roots`
+    plus custom entries added in code. The index (entries and each file's
+    mtime/size) is saved to `index_path`, so startup only loads JSON; a
+    rescan re-parses just the files that were added or changed, and can run
+    in the background. Lookups go exact name -> trigram candidates ->
+    edit-distance ranking.
+    """
+
+    def __init__(self, roots=None, index_path=INDEX_PATH):
+        self.roots = default_roots() if roots is None else list(roots)
+        self.index_path = index_path
+        self.files = {}          # path -> {"stamp": [mtime, size], "entry": AppEntry | None}
+        self.custom = {}         # name -> AppEntry
+        self.lock = threading.Lock()
+        self.scan_lock = threading.Lock()
+        self._rebuild_index()
+        self._load()
+
+    # --- persistence ---
+    def _load(self):
+        try:
+            with open(self.index_path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        files = {}
+        for path, item in data.get("files", {}).items():
+            entry = item.get("entry")
+            files[path] = {"stamp": item["stamp"], "entry": AppEntry(**entry) if entry else None}
+        with self.lock:
+            self.files = files
+        self._rebuild_index()
+
+    def _save(self):
+        with self.lock:
+            data = {"files": {path: {"stamp": item["stamp"],
+                                     "entry": item["entry"]._asdict() if item["entry"] else None}
+                              for path, item in self.files.items()}}
+        os.makedirs(os.path.dirname(self.index_path) or ".", exist_ok=True)
+        tmp = self.index_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp, self.index_path)
+
+    # --- scanning ---
+    def add_custom(self, name, path, aliases=()):
+        with self.lock:
+            self.custom[name] = AppEntry(name, sorted(aliases), path, None, "custom")
+        self._rebuild_index()
+
+    def rescan(self):
+        """Brings the index up to date. Returns (added_or_changed, removed) file counts."""
+        with self.scan_lock:
+            seen = {}
+            for root in self.roots:
+                for folder, _, names in os.walk(root):
+                    for file_name in names:
+                        if file_name.lower().endswith(APP_EXTENSIONS):
+                            path = os.path.join(folder, file_name)
+                            try:
+                                st = os.stat(path)
+                            except OSError:
+                                continue
+                            seen[path] = [st.st_mtime, st.st_size]
+
+            with self.lock:
+                known = dict(self.files)
+            changed = [p for p, stamp in seen.items() if known.get(p, {}).get("stamp") != stamp]
+            removed = [p for p in known if p not in seen]
+            if not changed and not removed:
+                return 0, 0
+
+            parsed = {}
+            for path in changed:
+                try:
+                    entry = parse_app_file(path)
+                except (OSError, ValueError) as e:
+                    print(f"[APPS] Skipping {path}: {e}")
+                    entry = None
+                parsed[path] = {"stamp": seen[path], "entry": entry}
+
+            with self.lock:
+                for path in removed:
+                    self.files.pop(path, None)
+                self.files.update(parsed)
+            self._rebuild_index()
+            self._save()
+            print(f"[APPS] Catalog updated: {len(changed)} new/changed, {len(removed)} removed")
+            return len(changed), len(removed)
+
+    def rescan_async(self):
+        threading.Thread(target=self._safe_rescan, daemon=True).start()
+
+    def _safe_rescan(self):
+        try:
+            self.rescan()
+        except Exception as e:
+            print(f"[APPS] Rescan failed: {e}")
+
+    # --- lookup ---
+    def _rebuild_index(self):
+        with self.lock:
+            entries = [item["entry"] for item in self.files.values() if item["entry"]]
+            entries += list(self.custom.values())
+
+        keys = {}          # normalised name/alias -> entry (custom entries win)
+        for entry in sorted(entries, key=lambda e: e.source == "custom"):
+            for key in [entry.name] + list(entry.aliases):
+                key = normalize(key)
+                if key:
+                    keys[key] = entry
+        grams = {}         # trigram -> keys containing it
+        sizes = {}         # key -> number of distinct trigrams
+        for key in keys:
+            key_grams = trigrams(key)
+            sizes[key] = len(key_grams)
+            for gram in key_grams:
+                grams.setdefault(gram, []).append(key)
+
+        # Swapped in as a whole so lookups never see a half-built index
+        self.index = (keys, grams, sizes)
+
+    def lookup(self, query):
+        """Best matching AppEntry for a spoken/typed app name, or None."""
+        keys, grams, sizes = self.index
+        query = normalize(query)
+        if not query:
+            return None
+        if query in keys:
+            return keys[query]
+
+        query_grams = trigrams(query)
+        counts = Counter()
+        for gram in query_grams:
+            counts.update(grams.get(gram, ()))
+        if not counts:
+            return None
+        # Jaccard overlap of trigram sets picks the few keys worth an edit-distance check
+        q = len(query_grams)
+        overlap = {k: c / (q + sizes[k] - c) for k, c in counts.items()}
+        candidates = heapq.nlargest(MAX_CANDIDATES, overlap, key=overlap.get)
+
+        best, best_score = None, 0.0
+        for key in candidates:
+            if overlap[key] < MIN_OVERLAP:
+                break
+            # "steam" should find "steam client" even though the lengths differ
+            if key.startswith(query + " ") or query.startswith(key + " "):
+                score = 0.8
+            elif 1.0 - abs(len(query) - len(key)) / max(len(query), len(key)) < max(best_score, MIN_SCORE):
+                continue    # the length difference alone rules it out
+            else:
+                score = 1.0 - edit_distance(query, key) / max(len(query), len(key))
+            if score > best_score:
+                best, best_score = key, score
+        return keys[best] if best_score >= MIN_SCORE else None
+
+    def __len__(self):
+        return len(self.index[0])
+
+
+if __name__ == "__main__":
+    # python app_catalog.py <folder> <app name>...  (scan a folder, try lookups)
+    import tempfile
+    catalog = AppCatalog([sys.argv[1]], os.path.join(tempfile.mkdtemp(), "apps.json"))
+    catalog.rescan()
+    for name in sys.argv[2:]:
+        print(f"{name!r} -> {catalog.lookup(name)}")
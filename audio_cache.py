@@ -0,0 +1,155 @@
+import os
+import glob
+import wave
+import hashlib
+import threading
+from collections import OrderedDict
+from audio_utils import wav_to_array, array_to_wav
+
+# Size caps (MB). Override with MARIE_AUDIO_CACHE_MB / MARIE_AUDIO_MEMORY_MB.
+DEFAULT_DISK_MB = 256
+DEFAULT_MEMORY_MB = 32
+
+
+class AudioCache:
+    """Content-addressed cache of finished (post-RVC) audio.
+
+    The key is a hash of everything that changes the sound, so a repeated
+    phrase in the same voice is played straight from here. Recent entries
+    are kept in memory; all entries live on disk under `cache_dir`. Both
+    levels evict the least recently used entry when over their cap.
+
+    Entries are (samples, sample_rate) in memory and WAV files on disk.
+    """
+
+    def __init__(self, cache_dir, max_disk_mb=None, max_memory_mb=None):
+        if max_disk_mb is None:
+            max_disk_mb = float(os.environ.get("MARIE_AUDIO_CACHE_MB", DEFAULT_DISK_MB))
+        if max_memory_mb is None:
+            max_memory_mb = float(os.environ.get("MARIE_AUDIO_MEMORY_MB", DEFAULT_MEMORY_MB))
+        self.cache_dir = cache_dir
+        self.max_disk = int(max_disk_mb * 1024 * 1024)
+        self.max_memory = int(max_memory_mb * 1024 * 1024)
+        os.makedirs(cache_dir, exist_ok=True)
+
+        self.memory = OrderedDict()   # key -> (samples, sample_rate)
+        self.memory_used = 0
+        self.disk = OrderedDict()     # key -> size, oldest first
+        self.disk_used = 0
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+        # Leftovers of writes interrupted by a crash
+        for path in glob.glob(os.path.join(cache_dir, "*.wav.tmp")):
+            try: os.remove(path)
+            except OSError: pass
+
+        # Rebuild the disk index, oldest access first
+        files = glob.glob(os.path.join(cache_dir, "*.wav"))
+        for path in sorted(files, key=os.path.getmtime):
+            key = os.path.splitext(os.path.basename(path))[0]
+            size = os.path.getsize(path)
+            self.disk[key] = size
+            self.disk_used += size
+        self._evict_disk()
+
+    @staticmethod
+    def make_key(clean_text, piper_model, speaker_id, length_scale, rvc_model, pitch):
+        raw = "\x1f".join([
+            clean_text, piper_model, str(speaker_id),
+            f"{length_scale:.4f}", rvc_model or "", str(pitch)
+        ])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.wav")
+
+    def get(self, key):
+        """Returns cached (samples, sample_rate), or None on a miss."""
+        with self.lock:
+            data = self.memory.get(key)
+            if data is not None:
+                self.memory.move_to_end(key)
+                if key in self.disk:
+                    self.disk.move_to_end(key)
+                self.hits += 1
+                return data
+
+            if key not in self.disk:
+                self.misses += 1
+                return None
+
+        try:
+            with open(self._path(key), "rb") as f:
+                data = wav_to_array(f.read())
+            os.utime(self._path(key))
+        except (OSError, EOFError, ValueError, wave.Error):
+            # Missing or corrupt (wave.Error: not a WAV at all): forget it so the sentence is synthesized again
+            with self.lock:
+                self._drop_disk(key)
+                self.misses += 1
+            try: os.remove(self._path(key))
+            except OSError: pass
+            return None
+
+        with self.lock:
+            self.hits += 1
+            if key in self.disk:
+                self.disk.move_to_end(key)
+            self._remember(key, data)
+        return data
+
+    def put(self, key, samples, rate):
+        wav = array_to_wav(samples, rate)
+        # Written aside and renamed into place, so a crash or a concurrent get never sees half a file
+        tmp = self._path(key) + ".tmp"
+        try:
+            with open(tmp, "wb") as f:
+                f.write(wav)
+            os.replace(tmp, self._path(key))
+        except OSError as e:
+            print(f"[AUDIO CACHE] Write failed: {e}")
+            return
+
+        with self.lock:
+            if key in self.disk:
+                self.disk_used -= self.disk[key]
+            self.disk[key] = len(wav)
+            self.disk.move_to_end(key)
+            self.disk_used += len(wav)
+            self._remember(key, (samples, rate))
+            self._evict_disk()
+
+    def _remember(self, key, data):
+        if key in self.memory:
+            self.memory_used -= self.memory[key][0].nbytes
+        self.memory[key] = data
+        self.memory.move_to_end(key)
+        self.memory_used += data[0].nbytes
+        while self.memory_used > self.max_memory and self.memory:
+            _, old = self.memory.popitem(last=False)
+            self.memory_used -= old[0].nbytes
+
+    def _drop_disk(self, key):
+        size = self.disk.pop(key, None)
+        if size is not None:
+            self.disk_used -= size
+
+    def _evict_disk(self):
+        while self.disk_used > self.max_disk and self.disk:
+            key, size = self.disk.popitem(last=False)
+            self.disk_used -= size
+            try: os.remove(self._path(key))
+            except OSError: pass
+
+    def stats(self):
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self.disk),
+                "disk_mb": round(self.disk_used / (1024 * 1024), 1),
+                "memory_mb": round(self.memory_used / (1024 * 1024), 1),
+            }
@@ -0,0 +1,98 @@
+import io
+import wave
+import numpy as np
+
+# All in-memory audio is (samples, sample_rate) with samples as mono int16.
+
+
+def pcm_to_array(pcm):
+    """Raw 16-bit little-endian PCM bytes -> int16 numpy array."""
+    return np.frombuffer(pcm, dtype=np.int16)
+
+
+def wav_to_array(data):
+    """WAV bytes -> (samples, sample_rate). Multi-channel audio is mixed down."""
+    with wave.open(io.BytesIO(data), "rb") as wf:
+        rate = wf.getframerate()
+        channels = wf.getnchannels()
+        width = wf.getsampwidth()
+        frames = wf.readframes(wf.getnframes())
+
+    if width == 2:
+        samples = np.frombuffer(frames, dtype=np.int16)
+    elif width == 4:
+        samples = (np.frombuffer(frames, dtype=np.int32) >> 16).astype(np.int16)
+    elif width == 1:
+        samples = ((np.frombuffer(frames, dtype=np.uint8).astype(np.int16) - 128) << 8)
+    else:
+        raise ValueError(f"Unsupported sample width: {width}")
+
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1).astype(np.int16)
+    return samples, rate
+
+
+def array_to_wav(samples, rate):
+    """(samples, sample_rate) -> WAV bytes, used for the on-disk audio cache."""
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(rate)
+        wf.writeframes(np.ascontiguousarray(samples, dtype=np.int16).tobytes())
+    return buf.getvalue()
+
+
+def resample(samples, src_rate, dst_rate):
+    """Linear-interpolation resampler. Good enough for speech playback."""
+    if src_rate == dst_rate or len(samples) == 0:
+        return samples
+    n_out = int(round(len(samples) * dst_rate / src_rate))
+    positions = np.linspace(0, len(samples) - 1, n_out)
+    out = np.interp(positions, np.arange(len(samples)), samples.astype(np.float32))
+    return out.astype(np.int16)
+
+
+def to_mixer_buffer(samples, rate, mixer_init):
+    """Converts mono int16 audio to the layout pygame.mixer was opened with.
+
+    mixer_init is the tuple from pygame.mixer.get_init(): (frequency, size, channels).
+    """
+    frequency, size, channels = mixer_init
+    out = resample(samples, rate, frequency)
+
+    if abs(size) == 8:
+        out = ((out >> 8) + (0 if size < 0 else 128)).astype(np.int8 if size < 0 else np.uint8)
+    elif abs(size) == 32:
+        out = out.astype(np.float32) / 32768.0
+    elif size > 0:
+        out = (out.astype(np.int32) + 32768).astype(np.uint16)
+
+    if channels > 1:
+        out = np.repeat(out[:, None], channels, axis=1)
+    return np.ascontiguousarray(out).tobytes()
+
+
+def compute_envelope(samples, rate, fps=60):
+    """Mouth-opening envelope for lip sync: one 0..1 value per 1/fps seconds.
+
+    Computed once per utterance over the whole buffer (frame RMS), so the
+    renderer only has to index into it by playback time.
+    """
+    n_frames = int(np.ceil(len(samples) * fps / rate))
+    if n_frames == 0:
+        return []
+
+    # Exact 1/fps frame boundaries (rate/fps is rarely an integer), summed in one pass
+    starts = (np.arange(n_frames) * rate / fps).astype(np.int64)
+    power = (samples.astype(np.float32) / 32768.0) ** 2
+    counts = np.diff(np.append(starts, len(samples)))
+    rms = np.sqrt(np.add.reduceat(power, starts) / np.maximum(counts, 1))
+
+    # Normalise against the loud parts of this utterance, then gate out breath noise
+    peak = np.percentile(rms, 95)
+    if peak <= 1e-6:
+        return [0.0] * n_frames
+    env = np.clip(rms / peak, 0.0, 1.0)
+    env = np.where(env < 0.08, 0.0, np.sqrt(env))
+    return np.round(env, 3).tolist()
@@ -0,0 +1,140 @@
+import os
+import math
+import time
+import threading
+from collections import namedtuple
+
+WIDTH, HEIGHT = 450, 600
+
+# Frame rates (override with MARIE_AVATAR_FPS / MARIE_AVATAR_IDLE_FPS). The idle
+# rate is used when nothing is speaking and the state has not changed recently.
+DEFAULT_FPS = 60
+DEFAULT_IDLE_FPS = 15
+IDLE_AFTER = 1.0          # seconds without speech or state changes
+
+BLINK_EVERY = 3.0
+BLINK_LENGTH = 0.2
+BREATH_SPEED = 3.125      # rad/s (the old 0.05 per 16 ms tick)
+
+# What the GUI tells the renderer. Replaced as a whole, never mutated, so the
+# render thread can read it without a lock.
+AvatarState = namedtuple("AvatarState", ["emotion", "changed_at"])
+
+
+class AvatarRenderer(threading.Thread):
+    """Draws the Live2D model on its own thread, independent of the Qt event loop.
+
+    The thread owns the pygame GL window (embedded into `parent_hwnd`) and the
+    model. Each frame it reads the latest AvatarState snapshot and the mouth
+    value from `mouth_source`, and paces itself on a monotonic clock: full
+    rate while speaking, a low rate when idle. Slow frames are dropped rather
+    than caught up.
+    """
+
+    def __init__(self, parent_hwnd, model_path, mouth_source, active_source, on_ready=None):
+        super().__init__(daemon=True)
+        self.parent_hwnd = parent_hwnd
+        self.model_path = model_path
+        self.mouth_source = mouth_source
+        self.active_source = active_source
+        self.on_ready = on_ready
+        self.fps = float(os.environ.get("MARIE_AVATAR_FPS", DEFAULT_FPS))
+        self.idle_fps = float(os.environ.get("MARIE_AVATAR_IDLE_FPS", DEFAULT_IDLE_FPS))
+        self.state = AvatarState(emotion=None, changed_at=time.monotonic())
+        self.running = True
+        self.frames = 0
+
+    def publish(self, **fields):
+        """Swaps in a new state snapshot (callable from any thread)."""
+        self.state = self.state._replace(changed_at=time.monotonic(), **fields)
+
+    def stop(self):
+        self.running = False
+        if self.is_alive():
+            self.join(timeout=1)
+
+    def run(self):
+        try:
+            import pygame
+            from live2d import v3 as live2d
+            import win32gui
+            import win32con
+            model = self._setup(pygame, live2d, win32gui, win32con)
+        except Exception as e:
+            print(f"[AVATAR] Could not start renderer: {e}")
+            if self.on_ready: self.on_ready(False)
+            return
+
+        if self.on_ready: self.on_ready(model is not None)
+        try:
+            if model is not None:
+                self._loop(pygame, live2d, model)
+        finally:
+            live2d.dispose()
+            pygame.quit()
+
+    def _setup(self, pygame, live2d, win32gui, win32con):
+        # The GL context belongs to this thread, so the window is created here too
+        pygame.init()
+        os.environ['SDL_VIDEO_WINDOW_POS'] = "%d,%d" % (-1000, -1000)
+        pygame.display.set_mode((WIDTH, HEIGHT), pygame.DOUBLEBUF | pygame.OPENGL | pygame.NOFRAME)
+
+        pygame_hwnd = pygame.display.get_wm_info()['window']
+        win32gui.SetParent(pygame_hwnd, self.parent_hwnd)
+        win32gui.SetWindowPos(pygame_hwnd, win32con.HWND_TOP, 0, 0, WIDTH, HEIGHT, win32con.SWP_SHOWWINDOW)
+
+        live2d.init()
+        live2d.glInit()
+
+        if not os.path.exists(self.model_path):
+            print(f"[AVATAR] Model not found: {self.model_path}")
+            return None
+        os.chdir(os.path.dirname(self.model_path))
+        model = live2d.LAppModel()
+        model.LoadModelJson(self.model_path)
+        model.Resize(WIDTH, HEIGHT)
+        return model
+
+    def _loop(self, pygame, live2d, model):
+        start = time.monotonic()
+        next_frame = start
+        emotion = None
+
+        while self.running:
+            now = time.monotonic()
+            state = self.state
+            speaking = self.active_source()
+            idle = not speaking and now - state.changed_at > IDLE_AFTER
+            period = 1.0 / (self.idle_fps if idle else self.fps)
+
+            pygame.event.pump()
+
+            if state.emotion != emotion:
+                emotion = state.emotion
+                if emotion:
+                    try: model.SetExpression(emotion)
+                    except Exception: pass
+
+            t = now - start
+            model.SetParameterValue("ParamBreath", (math.sin(t * BREATH_SPEED) + 1) / 2)
+            model.SetParameterValue("ParamMouthOpenY", self.mouth_source())
+            model.SetParameterValue("Param85", 1.0)
+
+            eyes = 0.0 if t % BLINK_EVERY > BLINK_EVERY - BLINK_LENGTH else 1.0
+            model.SetParameterValue("ParamEyeLOpen", eyes)
+            model.SetParameterValue("ParamEyeROpen", eyes)
+
+            model.Update()
+            live2d.clearBuffer(0.1, 0.1, 0.1, 1.0)
+            model.Draw()
+            pygame.display.flip()
+            self.frames += 1
+
+            # Frame pacing: aim at a fixed schedule; if we fell behind by more
+            # than a frame, start a new schedule instead of rendering a burst
+            next_frame += period
+            delay = next_frame - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            elif delay < -period:
+                next_frame = time.monotonic()
@@ -0,0 +1,73 @@
+"""Benchmark for the installed-app catalog (app_catalog.py).
+
+Builds a fixture directory of N .desktop files in a temp folder (works on
+Linux, no Start Menu needed), then times a full scan, a no-op rescan, an
+incremental rescan after touching a few files, and lookups for exact,
+misspelled and partial names. The fixture and the checks that every query
+resolves to the expected app live in tests/test_app_catalog.py.
+
+    python bench/app_lookup.py --apps 2000 --rounds 200
+"""
+import os
+import time
+import argparse
+import tempfile
+
+from harness import format_table
+from app_catalog import AppCatalog
+from tests.test_app_catalog import build_fixture
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="App catalog scan/lookup benchmark")
+    parser.add_argument("--apps", type=int, default=2000, help="fixture .desktop files")
+    parser.add_argument("--rounds", type=int, default=200, help="passes over the query list")
+    parser.add_argument("--touch", type=int, default=5, help="files changed before the incremental rescan")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        folder = os.path.join(tmp, "applications")
+        os.makedirs(folder)
+        paths = build_fixture(folder, args.apps)
+        index_path = os.path.join(tmp, "app_catalog.json")
+
+        catalog = AppCatalog([folder], index_path)
+        counts, full_s = timed(catalog.rescan)
+        print(f"[BENCH] Full scan: {counts[0]} files in {full_s * 1000:.1f} ms, {len(catalog)} names indexed")
+
+        counts, noop_s = timed(catalog.rescan)
+        print(f"[BENCH] Rescan, nothing changed: {noop_s * 1000:.1f} ms")
+
+        for path in paths[-args.touch:]:
+            with open(path, "a", encoding="utf-8") as f:
+                f.write("Comment=updated\n")
+        os.remove(paths[-args.touch - 1])
+        counts, incr_s = timed(catalog.rescan)
+        print(f"[BENCH] Incremental rescan: {counts[0]} changed, {counts[1]} removed in {incr_s * 1000:.1f} ms")
+
+        # A fresh instance only loads the saved index
+        reloaded, load_s = timed(lambda: AppCatalog([folder], index_path))
+        print(f"[BENCH] Load saved index: {load_s * 1000:.1f} ms ({len(reloaded)} names)")
+
+        metrics = {}
+        for label, queries in (("exact", ["steam", "discord", "obs studio"]),
+                               ("fuzzy", ["discrod", "spotfy", "minecraft"]),
+                               ("miss", ["zzqx", "no such app here"])):
+            samples = []
+            for _ in range(args.rounds):
+                start = time.perf_counter()
+                for query in queries:
+                    reloaded.lookup(query)
+                samples.append((time.perf_counter() - start) / len(queries))
+            metrics[label] = samples
+        print(format_table(metrics, unit="us per lookup", scale=1e6))
+
+
+if __name__ == "__main__":
+    main()
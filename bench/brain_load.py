@@ -0,0 +1,140 @@
+"""Load test of the brain server (server_reasoning.py) alone.
+
+Runs the FastAPI app in this process with the fake Ollama (bench/fakes.py)
+and, for each level in --users, starts that many simulated GUI clients
+streaming /chat back to back. A separate prober hits /health the whole
+time, since that is what stalls first when requests tie up the server.
+
+    python bench/brain_load.py --users 1,8,32,64 --seconds 10
+
+Reported per level:
+  turns/s     completed /chat streams per second
+  ttft        first streamed token
+  turn        whole stream
+  health      /health round trip while under load
+
+With a fake LLM that can serve every user at once (--llm-slots defaults to
+the largest level), turns/s should grow with the number of users instead
+of flattening at the size of a threadpool.
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import threading
+import contextlib
+
+from harness import format_table, write_json, free_port, start_server
+from fakes import FakeOllama
+from round_trip import load_utterances
+
+HEALTH_INTERVAL = 0.05
+
+
+def install_fakes(args, workdir):
+    os.environ.setdefault("MARIE_TRACE_DIR", os.path.join(workdir, "traces"))
+    os.environ["MARIE_LLM_CONCURRENCY"] = str(args.llm_slots)
+    os.chdir(workdir)
+    sys.modules["ollama"] = FakeOllama(args.seed, args.token_rate, args.prefill_ms).as_module()
+    import server_reasoning
+    return server_reasoning.app
+
+
+def simulate_user(user_id, url, utterances, deadline, seed, results, lock):
+    import requests
+    rng = random.Random(f"{seed}:{user_id}")
+    session = requests.Session()
+    while time.time() < deadline:
+        payload = {"text": rng.choice(utterances), "user_id": user_id, "stream": True}
+        t0 = time.time()
+        ttft = None
+        with session.post(url, json=payload, stream=True) as response:
+            response.raise_for_status()
+            for chunk in response.iter_content(chunk_size=None):
+                if chunk and ttft is None:
+                    ttft = time.time() - t0
+        with lock:
+            results.append((ttft, time.time() - t0))
+
+
+def probe_health(url, stop, samples):
+    import requests
+    session = requests.Session()
+    while not stop.is_set():
+        t0 = time.time()
+        session.get(url, timeout=30)
+        samples.append(time.time() - t0)
+        time.sleep(HEALTH_INTERVAL)
+
+
+def run_level(users, args, urls, utterances):
+    results, lock = [], threading.Lock()
+    health, stop = [], threading.Event()
+    prober = threading.Thread(target=probe_health, args=(urls["health"], stop, health), daemon=True)
+    prober.start()
+
+    start = time.time()
+    deadline = start + args.seconds
+    threads = [threading.Thread(target=simulate_user,
+                                args=(uid, urls["chat"], utterances, deadline, args.seed, results, lock))
+               for uid in range(1, users + 1)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    wall = time.time() - start
+    stop.set()
+    prober.join()
+
+    return {
+        "turns_per_s": len(results) / wall,
+        "ttft": [r[0] for r in results if r[0] is not None],
+        "turn": [r[1] for r in results],
+        "health": health,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Brain server concurrency load test")
+    parser.add_argument("--users", default="1,8,32,64", help="comma-separated concurrency levels")
+    parser.add_argument("--seconds", type=float, default=10.0, help="duration of each level")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--token-rate", type=float, default=30.0, help="fake LLM tokens per second")
+    parser.add_argument("--prefill-ms", type=float, default=150.0, help="fake LLM prefill per request")
+    parser.add_argument("--llm-slots", type=int, help="MARIE_LLM_CONCURRENCY (default: largest level)")
+    parser.add_argument("--json", help="write summaries to this file")
+    parser.add_argument("--verbose", action="store_true", help="show server logs")
+    args = parser.parse_args()
+    levels = [int(u) for u in args.users.split(",")]
+    args.llm_slots = args.llm_slots or max(levels)
+    if args.json:
+        args.json = os.path.abspath(args.json)
+
+    workdir = tempfile.mkdtemp(prefix="marie_load_")
+    quiet = open(os.devnull, "w") if not args.verbose else None
+    report = {}
+    with contextlib.redirect_stdout(quiet) if quiet else contextlib.nullcontext():
+        app = install_fakes(args, workdir)
+        port = free_port()
+        server = start_server(app, port)
+        urls = {"chat": f"http://127.0.0.1:{port}/chat", "health": f"http://127.0.0.1:{port}/health"}
+        utterances = load_utterances()
+        for users in levels:
+            report[users] = run_level(users, args, urls, utterances)
+        server.should_exit = True
+
+    print(f"[BENCH] {args.seconds:.0f}s per level, {args.llm_slots} LLM slot(s), "
+          f"fake LLM {args.token_rate:.0f} tok/s")
+    for users, level in report.items():
+        print(f"\n[BENCH] {users} user(s): {level['turns_per_s']:.2f} turns/s")
+        print(format_table({k: level[k] for k in ("ttft", "turn", "health")}))
+    if args.json:
+        metrics = {f"{users}_users_{k}": level[k] for users, level in report.items()
+                   for k in ("ttft", "turn", "health")}
+        config = dict(vars(args), turns_per_s={users: level["turns_per_s"] for users, level in report.items()})
+        write_json(args.json, config, metrics)
+        print(f"[BENCH] Wrote {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+import time
+import types
+import asyncio
+import random
+import hashlib
+import numpy as np
+
+# Local stand-ins for the heavy backends, so the servers can be benchmarked
+# without a GPU, Ollama, Piper voices or RVC models. Every fake is driven by
+# a seed, so the same run produces the same replies and the same audio.
+
+WORDS = (
+    "experiment data theory result coffee lab sample hypothesis energy speed "
+    "morning project music idea question answer simple really quite rather "
+    "today tomorrow tonight little bit more very interesting indeed"
+).split()
+EMOTIONS = ["happy", "curious", "smug", "excited", "explaining", "tired"]
+
+
+def _rng(seed, *parts):
+    """Deterministic RNG for one call, independent of call order across threads."""
+    digest = hashlib.sha256("\x1f".join([str(seed)] + [str(p) for p in parts]).encode("utf-8")).digest()
+    return random.Random(int.from_bytes(digest[:8], "big"))
+
+
+class FakeOllama:
+    """Streams a made-up reply at a fixed token rate, like ollama.chat(stream=True).
+
+    prefill_ms is paid once per request, plus prefill_per_char_ms for every
+    prompt character not shared with the previous prompt (Ollama keeps the KV
+    cache of its last prompt). Then each token arrives 1/token_rate seconds
+    after the last.
+    """
+
+    def __init__(self, seed=0, token_rate=30.0, prefill_ms=150.0, prefill_per_char_ms=0.02,
+                 min_sentences=2, max_sentences=4):
+        self.seed = seed
+        self.token_rate = token_rate
+        self.prefill_ms = prefill_ms
+        self.prefill_per_char_ms = prefill_per_char_ms
+        self.min_sentences = min_sentences
+        self.max_sentences = max_sentences
+        self.last_prompt = ""
+
+    def reply_tokens(self, messages):
+        rng = _rng(self.seed, *(m.get("content", "") for m in messages))
+        tokens = [f"[{rng.choice(EMOTIONS)}]"]
+        for _ in range(rng.randint(self.min_sentences, self.max_sentences)):
+            words = [rng.choice(WORDS) for _ in range(rng.randint(5, 14))]
+            words[0] = words[0].capitalize()
+            tokens.extend(" " + w for w in words)
+            tokens[-1] += rng.choice([".", ".", "!", "?"])
+        return tokens
+
+    def _plan(self, messages):
+        """Reply tokens, prompt characters to prefill, and prefill time for one request."""
+        tokens = self.reply_tokens(messages)
+        prompt = "".join(f"{m.get('role')}:{m.get('content', '')}\n" for m in messages)
+        shared = 0
+        for a, b in zip(prompt, self.last_prompt):
+            if a != b: break
+            shared += 1
+        self.last_prompt = prompt
+        prompt_chars = len(prompt) - shared
+        prefill = (self.prefill_ms + prompt_chars * self.prefill_per_char_ms) / 1000.0
+        return tokens, prompt_chars, prefill
+
+    def _chunk(self, model, token):
+        return {"model": model, "message": {"role": "assistant", "content": token}, "done": False}
+
+    def _done(self, model, tokens, prompt_chars, start, eval_start, end):
+        return {
+            "model": model, "message": {"role": "assistant", "content": ""}, "done": True,
+            "total_duration": int((end - start) * 1e9),
+            "prompt_eval_count": prompt_chars // 4,
+            "prompt_eval_duration": int((eval_start - start) * 1e9),
+            "eval_count": len(tokens),
+            "eval_duration": int((end - eval_start) * 1e9),
+        }
+
+    def chat(self, model=None, messages=None, stream=False, **kwargs):
+        tokens, prompt_chars, prefill = self._plan(messages or [])
+
+        def chunks():
+            start = time.perf_counter()
+            time.sleep(prefill)
+            eval_start = time.perf_counter()
+            for token in tokens:
+                time.sleep(1.0 / self.token_rate)
+                yield self._chunk(model, token)
+            yield self._done(model, tokens, prompt_chars, start, eval_start, time.perf_counter())
+
+        if stream:
+            return chunks()
+        content = "".join(c["message"]["content"] for c in chunks())
+        return {"model": model, "message": {"role": "assistant", "content": content}, "done": True}
+
+    async def chat_async(self, model=None, messages=None, stream=False, **kwargs):
+        """Same as chat(), but waits with asyncio.sleep like ollama.AsyncClient.chat."""
+        tokens, prompt_chars, prefill = self._plan(messages or [])
+
+        async def chunks():
+            start = time.perf_counter()
+            await asyncio.sleep(prefill)
+            eval_start = time.perf_counter()
+            for token in tokens:
+                await asyncio.sleep(1.0 / self.token_rate)
+                yield self._chunk(model, token)
+            yield self._done(model, tokens, prompt_chars, start, eval_start, time.perf_counter())
+
+        if stream:
+            return chunks()
+        content = "".join([c["message"]["content"] async for c in chunks()])
+        return {"model": model, "message": {"role": "assistant", "content": content}, "done": True}
+
+    def as_module(self):
+        """A module object that can stand in for `import ollama`."""
+        fake = self
+
+        class AsyncClient:
+            def __init__(self, host=None, **kwargs):
+                pass
+
+            async def chat(self, *args, **kwargs):
+                return await fake.chat_async(*args, **kwargs)
+
+        module = types.ModuleType("ollama")
+        module.chat = self.chat
+        module.AsyncClient = AsyncClient
+        return module
+
+
+class FakePiperEngine:
+    """Same interface as piper_engine.PiperEngine; emits a tone instead of speech.
+
+    Audio length follows the text (seconds_per_char * length_scale), and
+    synthesis takes rtf times that long.
+    """
+
+    def __init__(self, seed=0, rtf=0.1, sample_rate=22050, seconds_per_char=0.06):
+        self.seed = seed
+        self.rtf = rtf
+        self.sample_rate = sample_rate
+        self.seconds_per_char = seconds_per_char
+
+    def get_voice(self, piper_model):
+        return self
+
+    def synthesize(self, piper_model, text, speaker_id=0, length_scale=1.0):
+        duration = max(0.2, len(text) * self.seconds_per_char * length_scale)
+        time.sleep(duration * self.rtf)
+
+        rng = _rng(self.seed, piper_model, text, speaker_id)
+        t = np.arange(int(duration * self.sample_rate)) / self.sample_rate
+        pitch = 140 + rng.random() * 80
+        # Syllable-like 4 Hz amplitude modulation so the lip-sync envelope moves
+        wave = np.sin(2 * np.pi * pitch * t) * (0.5 + 0.5 * np.sin(2 * np.pi * 4 * t))
+        samples = (wave * 12000).astype(np.int16)
+        return samples.tobytes(), self.sample_rate
+
+    def unload(self, piper_model):
+        pass
+
+    def close(self):
+        pass
+
+
+class FakeRVC:
+    """A MarieVoice converter that only costs time (rtf x audio duration)."""
+
+    def __init__(self, rtf=0.3):
+        self.rtf = rtf
+
+    def __call__(self, samples, rate, char_data):
+        time.sleep(len(samples) / float(rate) * self.rtf)
+        return samples, rate
+
+
+def fake_playback(scale=1.0):
+    """Replacement for MarieVoice.play_audio: blocks for the audio's duration x scale."""
+    def play_audio(self, audio, face_callback=None):
+        samples, rate = audio
+        time.sleep(len(samples) / float(rate) * scale)
+    return play_audio
@@ -0,0 +1,73 @@
+import os
+import sys
+import json
+import time
+import socket
+import threading
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+
+def percentile(values, pct):
+    """Linear-interpolated percentile of a list (pct in 0..100)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    pos = (len(ordered) - 1) * pct / 100.0
+    low = int(pos)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (pos - low)
+
+
+def summarize(values):
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "mean": sum(values) / len(values),
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "max": max(values),
+    }
+
+
+def format_table(metrics, unit="ms", scale=1000.0):
+    """metrics: {name: [values in seconds]} -> printable table."""
+    lines = [f"{'metric':<24}{'n':>6}{'mean':>10}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}  ({unit})"]
+    for name, values in metrics.items():
+        s = summarize(values)
+        if not s["count"]:
+            lines.append(f"{name:<24}{0:>6}")
+            continue
+        cols = "".join(f"{s[k] * scale:>10.1f}" for k in ("mean", "p50", "p95", "p99", "max"))
+        lines.append(f"{name:<24}{s['count']:>6}{cols}")
+    return "\n".join(lines)
+
+
+def write_json(path, config, metrics):
+    """Saves config + summaries so two runs can be diffed for regressions."""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"config": config, "metrics": {k: summarize(v) for k, v in metrics.items()}},
+                  f, indent=2, sort_keys=True)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(app, port):
+    """Runs a FastAPI app with uvicorn on a background thread (loopback only)."""
+    import uvicorn
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise RuntimeError(f"Server on port {port} failed to start")
+        time.sleep(0.01)
+    return server
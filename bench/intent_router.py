@@ -0,0 +1,103 @@
+"""Throughput benchmark for the intent router (intents.py).
+
+Routes a corpus of real utterances (bench/commands.txt + bench/utterances.txt)
+many times and reports per-utterance cost, next to the old chain of
+startswith/in checks from ActionHandler.execute for comparison. Also lists
+the utterances where the two disagree, e.g. "mute" inside a sentence.
+
+The router is not faster on this corpus: it costs roughly 3.1 us per
+utterance against 2-3 us for the legacy chain. Both are far
+below anything a user would notice. The gain is in what matches, not in
+matching cost.
+
+    python bench/intent_router.py --rounds 2000
+"""
+import os
+import re
+import time
+import argparse
+
+from harness import format_table
+from intents import IntentRouter
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_corpus():
+    lines = []
+    for name in ("commands.txt", "utterances.txt"):
+        with open(os.path.join(BENCH_DIR, name), encoding="utf-8") as f:
+            lines.extend(line.strip() for line in f if line.strip() and not line.startswith("#"))
+    return lines
+
+
+def legacy_route(text):
+    """The pre-router matching order of ActionHandler.execute, returning the intent name.
+
+    The slot clean-up string work is kept (results unused) so the cost compares fairly.
+    """
+    if not text: return None
+    text = text.lower().strip()
+    if "scan apps" in text or "update apps" in text:
+        return "scan_apps"
+    if text.startswith("play "):
+        text.replace("play ", "").replace("please", "").strip()
+        return "play_video"
+    if next((w for w in ["write ", "note ", "type ", "take a note "] if text.startswith(w)), None):
+        return "write_note"
+    if "volume up" in text:
+        return "volume_up"
+    elif "volume down" in text:
+        return "volume_down"
+    elif "mute" in text or "unmute" in text:
+        return "mute"
+    if text.startswith("open "):
+        app_name = text.replace("open ", "").strip().replace("please", "").replace("now", "").strip()
+        re.sub(r'[^\w\s]', '', app_name)
+        return "open_app"
+    if text.startswith("close "):
+        re.sub(r'[^\w\s]', '', text.replace("close ", "").replace("please", "").strip())
+        return "close_app"
+    return None
+
+
+def time_per_call(fn, corpus, rounds):
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for text in corpus:
+            fn(text)
+        samples.append((time.perf_counter() - start) / len(corpus))
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Intent router throughput benchmark")
+    parser.add_argument("--rounds", type=int, default=1000, help="passes over the corpus")
+    args = parser.parse_args()
+
+    corpus = load_corpus()
+    start = time.perf_counter()
+    router = IntentRouter()
+    compile_ms = (time.perf_counter() - start) * 1000
+
+    metrics = {
+        "router": time_per_call(router.route, corpus, args.rounds),
+        "legacy chain": time_per_call(legacy_route, corpus, args.rounds),
+    }
+    print(f"[BENCH] {len(corpus)} utterances x {args.rounds} rounds, router compiled in {compile_ms:.2f} ms")
+    print(format_table(metrics, unit="us per utterance", scale=1e6))
+
+    per_sec = len(corpus) * args.rounds / sum(s * len(corpus) for s in metrics["router"])
+    print(f"[BENCH] Router throughput: {per_sec:,.0f} utterances/s")
+
+    print("\n[BENCH] Router vs legacy disagreements:")
+    for text in corpus:
+        intent = router.route(text)
+        new, old = (intent.name if intent else None), legacy_route(text)
+        if new != old:
+            print(f"  {text!r}: router={new} legacy={old}")
+
+
+if __name__ == "__main__":
+    main()
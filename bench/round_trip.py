@@ -0,0 +1,178 @@
+"""Headless benchmark of a full turn: text -> brain server -> voice server -> playback.
+
+Both FastAPI apps run in this process on loopback ports with fake backends
+(bench/fakes.py), and each simulated user does what MainWindow.process_logic
+does: stream /chat, split sentences, queue them on /speak, then follow the
+jobs until they have played. Nothing needs a GPU or the network.
+
+    python bench/round_trip.py --users 4 --turns 10 --seed 1 --json run.json
+
+Reported per turn:
+  ttft        first streamed token from /chat
+  ttfa        first sentence starts playing on the voice server
+  generation  /chat stream finished
+  total       last sentence finished playing
+
+There is one voice server (one speaker) shared by all users, as in the app,
+so with several users playback queues up behind each other.
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import threading
+import contextlib
+
+from harness import format_table, write_json, free_port, start_server
+from fakes import FakeOllama, FakePiperEngine, FakeRVC, fake_playback
+
+POLL_INTERVAL = 0.01
+
+
+def load_utterances(path=None):
+    path = path or os.path.join(os.path.dirname(os.path.abspath(__file__)), "utterances.txt")
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+
+def install_fakes(args, workdir):
+    """Puts the fakes in place of Ollama, Piper, RVC and the speaker, then imports the servers."""
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    os.environ.setdefault("MARIE_TRACE_DIR", os.path.join(workdir, "traces"))
+    # MarieDB uses a relative path, so the servers get a fresh database here
+    os.chdir(workdir)
+
+    sys.modules["ollama"] = FakeOllama(args.seed, args.token_rate, args.prefill_ms).as_module()
+
+    import piper_engine
+    piper_engine._engine = FakePiperEngine(args.seed, rtf=args.tts_rtf)
+
+    import voice
+    voice.MarieVoice.play_audio = fake_playback(args.playback_scale)
+
+    import server_reasoning
+    import server_voice
+    from audio_cache import AudioCache
+    server_voice.voice_engine.audio_cache = AudioCache(os.path.join(workdir, "audio"))
+    server_voice.voice_engine.converter = FakeRVC(args.rvc_rtf) if args.rvc_rtf > 0 else None
+    return server_reasoning.app, server_voice.app
+
+
+def run_turn(session, urls, user_id, text, character):
+    from sentence_stream import SentenceSplitter
+    from tracing import new_trace_id
+
+    t0 = time.time()
+    trace_id = new_trace_id()
+    ttft = None
+    job_ids = []
+    splitter = SentenceSplitter()
+
+    def queue_speech(sentence):
+        job = session.post(urls["speak"], json={"text": sentence, "character": character,
+                                                  "trace_id": trace_id}).json()
+        if job.get("job_id"):
+            job_ids.append(job["job_id"])
+
+    payload = {"text": text, "user_id": user_id, "stream": True, "trace_id": trace_id}
+    with session.post(urls["chat"], json=payload, stream=True) as response:
+        response.raise_for_status()
+        response.encoding = "utf-8"
+        for chunk in response.iter_content(chunk_size=None, decode_unicode=True):
+            if not chunk: continue
+            if ttft is None:
+                ttft = time.time() - t0
+            for sentence in splitter.feed(chunk):
+                queue_speech(sentence)
+    for sentence in splitter.flush():
+        queue_speech(sentence)
+    generation = time.time() - t0
+
+    # Follow every job until it has played (same polling the lip-sync follower does)
+    started, finished = [], []
+    pending = list(job_ids)
+    while pending:
+        for job_id in list(pending):
+            job = session.get(f"{urls['speak']}/{job_id}").json()
+            if job.get("status") in ("done", "error", "cancelled", None):
+                pending.remove(job_id)
+                if job.get("started_at"): started.append(job["started_at"])
+                if job.get("finished_at"): finished.append(job["finished_at"])
+        if pending:
+            time.sleep(POLL_INTERVAL)
+
+    return {
+        "ttft": ttft,
+        "ttfa": min(started) - t0 if started else None,
+        "generation": generation,
+        "total": (max(finished) if finished else time.time()) - t0,
+    }
+
+
+def simulate_user(user_id, args, urls, utterances, results, lock):
+    import requests
+    rng = random.Random(f"{args.seed}:{user_id}")
+    session = requests.Session()
+    for _ in range(args.turns):
+        turn = run_turn(session, urls, user_id, rng.choice(utterances), args.character)
+        with lock:
+            results.append(turn)
+        time.sleep(rng.uniform(0, args.think_ms) / 1000.0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless text->brain->voice latency benchmark")
+    parser.add_argument("--users", type=int, default=1, help="concurrent simulated users")
+    parser.add_argument("--turns", type=int, default=5, help="turns per user")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--token-rate", type=float, default=30.0, help="fake LLM tokens per second")
+    parser.add_argument("--prefill-ms", type=float, default=150.0, help="fake LLM prefill per request")
+    parser.add_argument("--tts-rtf", type=float, default=0.1, help="fake Piper real-time factor")
+    parser.add_argument("--rvc-rtf", type=float, default=0.3, help="fake RVC real-time factor (0 = off)")
+    parser.add_argument("--playback-scale", type=float, default=0.1,
+                        help="fraction of real time spent 'playing' audio")
+    parser.add_argument("--think-ms", type=float, default=200.0, help="max pause between a user's turns")
+    parser.add_argument("--character", default="tachyon")
+    parser.add_argument("--json", help="write summaries to this file")
+    parser.add_argument("--verbose", action="store_true", help="show server logs")
+    args = parser.parse_args()
+    if args.json:
+        args.json = os.path.abspath(args.json)
+
+    workdir = tempfile.mkdtemp(prefix="marie_bench_")
+    quiet = open(os.devnull, "w") if not args.verbose else None
+    with contextlib.redirect_stdout(quiet) if quiet else contextlib.nullcontext():
+        brain_app, voice_app = install_fakes(args, workdir)
+        brain_port, voice_port = free_port(), free_port()
+        servers = [start_server(brain_app, brain_port), start_server(voice_app, voice_port)]
+        urls = {
+            "chat": f"http://127.0.0.1:{brain_port}/chat",
+            "speak": f"http://127.0.0.1:{voice_port}/speak",
+        }
+
+        utterances = load_utterances()
+        results, lock = [], threading.Lock()
+        wall = time.time()
+        users = [threading.Thread(target=simulate_user, args=(uid, args, urls, utterances, results, lock))
+                 for uid in range(1, args.users + 1)]
+        for t in users: t.start()
+        for t in users: t.join()
+        wall = time.time() - wall
+
+        for server in servers:
+            server.should_exit = True
+
+    metrics = {name: [r[name] for r in results if r[name] is not None]
+               for name in ("ttft", "ttfa", "generation", "total")}
+    print(f"[BENCH] {args.users} user(s) x {args.turns} turn(s), seed {args.seed}, "
+          f"{len(results)} turns in {wall:.1f}s")
+    print(format_table(metrics))
+    if args.json:
+        write_json(args.json, vars(args), metrics)
+        print(f"[BENCH] Wrote {args.json}")
+
+
+if __name__ == "__main__":
+    main()
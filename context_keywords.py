@@ -0,0 +1,111 @@
+import re
+import queue
+import threading
+from collections import deque
+
+# Only the tagger is needed for NOUN/PROPN; everything else in the pipeline is skipped
+SPACY_MODEL = "en_core_web_sm"
+SPACY_DISABLE = ["parser", "ner", "lemmatizer", "senter"]
+
+MAX_KEYWORDS = 15
+# Each new utterance multiplies older scores by this, so stale topics fade out
+DECAY = 0.8
+
+# Used only if spaCy is missing: longer words that are not obviously function words
+FALLBACK_WORD = re.compile(r"[A-Za-z][A-Za-z'-]{3,}")
+FALLBACK_STOPWORDS = {
+    "about", "after", "again", "also", "been", "before", "being", "could", "does",
+    "doing", "from", "have", "here", "into", "just", "know", "like", "make", "more",
+    "much", "only", "really", "some", "than", "that", "their", "them", "then",
+    "there", "these", "they", "thing", "think", "this", "those", "want", "was",
+    "well", "were", "what", "when", "where", "which", "while", "will", "with",
+    "would", "your", "yeah", "okay",
+}
+
+_nlp = None
+_nlp_lock = threading.Lock()
+
+
+def get_nlp():
+    """Loads the spaCy tagger on first use. Returns None if spaCy is unavailable."""
+    global _nlp
+    with _nlp_lock:
+        if _nlp is None:
+            try:
+                import spacy
+                _nlp = spacy.load(SPACY_MODEL, disable=SPACY_DISABLE)
+            except Exception as e:
+                print(f"[CONTEXT] spaCy unavailable, using plain word matching: {e}")
+                _nlp = False
+        return _nlp or None
+
+
+def extract_keywords(text):
+    nlp = get_nlp()
+    if nlp is not None:
+        return [t.text for t in nlp(text) if t.pos_ in ("NOUN", "PROPN")]
+    return [w for w in FALLBACK_WORD.findall(text) if w.lower() not in FALLBACK_STOPWORDS]
+
+
+class KeywordRanking:
+    """Bounded keyword set ranked by decayed frequency.
+
+    Every mention adds 1 to a keyword's score and every utterance decays all
+    scores, so the kept keywords are the ones mentioned most, most recently.
+    """
+
+    def __init__(self, max_keywords=MAX_KEYWORDS, decay=DECAY):
+        self.max_keywords = max_keywords
+        self.decay = decay
+        self.scores = {}      # lowercased keyword -> score
+        self.display = {}     # lowercased keyword -> spelling last heard
+
+    def add(self, keywords):
+        for key in self.scores:
+            self.scores[key] *= self.decay
+        for word in keywords:
+            key = word.lower()
+            self.scores[key] = self.scores.get(key, 0.0) + 1.0
+            self.display[key] = word
+
+        if len(self.scores) > self.max_keywords:
+            for key in sorted(self.scores, key=self.scores.get)[:len(self.scores) - self.max_keywords]:
+                del self.scores[key]
+                del self.display[key]
+
+    def top(self):
+        ranked = sorted(self.scores, key=self.scores.get, reverse=True)
+        return [self.display[key] for key in ranked]
+
+
+class ContextBrain:
+    """Keeps the Whisper initial_prompt in line with what is being talked about.
+
+    update() only queues the transcript; tagging happens on a background
+    thread so the capture loop never waits on spaCy. get_prompt() returns the
+    last prompt string built by that thread.
+    """
+
+    def __init__(self, max_history=3, max_keywords=MAX_KEYWORDS):
+        self.history = deque(maxlen=max_history)
+        self.ranking = KeywordRanking(max_keywords)
+        self.prompt = "General conversation."
+        self.pending = queue.Queue()
+        threading.Thread(target=self._worker, daemon=True).start()
+
+    def update(self, text):
+        self.history.append(text)
+        self.pending.put(text)
+
+    def get_prompt(self):
+        return self.prompt
+
+    def _worker(self):
+        while True:
+            text = self.pending.get()
+            try:
+                self.ranking.add(extract_keywords(text))
+                keywords = self.ranking.top()
+                self.prompt = f"Context: {', '.join(keywords)}." if keywords else "General conversation."
+            except Exception as e:
+                print(f"[CONTEXT] {e}")
@@ -0,0 +1,165 @@
+import os
+import re
+import queue
+import threading
+from collections import OrderedDict
+
+# Token budgets (approximate, ~4 characters per token). Override with
+# MARIE_HISTORY_TOKENS / MARIE_SUMMARY_TOKENS.
+DEFAULT_HISTORY_TOKENS = 1024
+DEFAULT_SUMMARY_TOKENS = 200
+
+# How many chat_logs rows are read when a user's history is first needed
+LOAD_ROWS = 40
+MAX_USERS = 64
+
+# Appended to a logged reply that the user's next message cut off. Such
+# replies stay in chat_logs but never go back into the LLM history.
+INTERRUPTED_MARKER = "(interrupted)"
+
+
+def estimate_tokens(text):
+    return len(text) // 4 + 1
+
+
+class _UserContext:
+    def __init__(self):
+        self.summary = ""
+        self.turns = []           # [(user_text, reply)], oldest first
+        self.loaded = False
+        self.lock = threading.Lock()
+
+
+class ConversationManager:
+    """Bounded multi-turn context for the LLM, per user.
+
+    Recent turns are kept in memory (seeded from chat_logs the first time a
+    user shows up). When they exceed the token budget, the oldest turns are
+    moved out and folded into a rolling summary on a background thread, so
+    no request waits on summarization. Between summaries the message list
+    only grows at the end, which keeps the prompt prefix stable.
+    """
+
+    def __init__(self, db, summarize, history_tokens=None, summary_tokens=None):
+        self.db = db
+        # summarize(previous_summary, [(user_text, reply)], max_tokens) -> str
+        self.summarize = summarize
+        self.history_tokens = history_tokens or int(os.environ.get("MARIE_HISTORY_TOKENS", DEFAULT_HISTORY_TOKENS))
+        self.summary_tokens = summary_tokens or int(os.environ.get("MARIE_SUMMARY_TOKENS", DEFAULT_SUMMARY_TOKENS))
+        self.users = OrderedDict()
+        self.users_lock = threading.Lock()
+        self.jobs = queue.Queue()
+        threading.Thread(target=self._summarize_loop, daemon=True).start()
+
+    def _context(self, user_id):
+        with self.users_lock:
+            ctx = self.users.get(user_id)
+            if ctx is None:
+                ctx = _UserContext()
+                self.users[user_id] = ctx
+                while len(self.users) > MAX_USERS:
+                    self.users.popitem(last=False)
+            self.users.move_to_end(user_id)
+
+        if not ctx.loaded:
+            with ctx.lock:
+                if not ctx.loaded:
+                    ctx.turns = self._load_turns(user_id) + ctx.turns
+                    ctx.loaded = True
+            self._trim(user_id, ctx)
+        return ctx
+
+    def _load_turns(self, user_id):
+        """Pairs the newest chat_logs rows into (user, marie) turns."""
+        try:
+            rows = self.db.fetch_chat_logs(user_id, limit=LOAD_ROWS)
+        except Exception as e:
+            print(f"[CONTEXT] Could not load history: {e}")
+            return []
+
+        turns = []
+        pending_user = None
+        for _, _, sender, content, _ in reversed(rows):
+            if sender == "user":
+                pending_user = content
+            elif sender == "marie" and content.endswith(INTERRUPTED_MARKER):
+                # Cut off by the next message, which may already be logged above it
+                continue
+            elif sender == "marie" and pending_user is not None:
+                turns.append((pending_user, content))
+                pending_user = None
+        # A trailing user message without a reply is the one being answered now
+        return turns
+
+    def messages(self, user_id):
+        """History as chat messages: the rolling summary (if any), then recent turns."""
+        ctx = self._context(user_id)
+        with ctx.lock:
+            summary, turns = ctx.summary, list(ctx.turns)
+
+        messages = []
+        if summary:
+            messages.append({"role": "system", "content": f"Earlier in this conversation: {summary}"})
+        for user_text, reply in turns:
+            messages.append({"role": "user", "content": user_text})
+            messages.append({"role": "assistant", "content": reply})
+        return messages
+
+    def add_turn(self, user_id, user_text, reply):
+        if not user_text or not reply:
+            return
+        ctx = self._context(user_id)
+        with ctx.lock:
+            ctx.turns.append((user_text, reply))
+        self._trim(user_id, ctx)
+
+    def _trim(self, user_id, ctx):
+        """Moves the oldest turns out of the window until it fits the budget."""
+        with ctx.lock:
+            budget = self.history_tokens - estimate_tokens(ctx.summary)
+            used = sum(estimate_tokens(u) + estimate_tokens(r) for u, r in ctx.turns)
+            evicted = []
+            # Always keep the latest turn, even if it alone is over budget
+            while used > budget and len(ctx.turns) > 1:
+                user_text, reply = ctx.turns.pop(0)
+                used -= estimate_tokens(user_text) + estimate_tokens(reply)
+                evicted.append((user_text, reply))
+        if evicted:
+            self.jobs.put((user_id, ctx, evicted))
+
+    def _summarize_loop(self):
+        while True:
+            user_id, ctx, evicted = self.jobs.get()
+            with ctx.lock:
+                previous = ctx.summary
+            try:
+                summary = self.summarize(previous, evicted, self.summary_tokens)
+            except Exception as e:
+                print(f"[CONTEXT] Summary failed, keeping a short extract: {e}")
+                summary = fallback_summary(previous, evicted, self.summary_tokens)
+            summary = truncate_tokens(summary.strip(), self.summary_tokens)
+            with ctx.lock:
+                ctx.summary = summary
+            self._trim(user_id, ctx)
+
+
+def truncate_tokens(text, max_tokens):
+    limit = max_tokens * 4
+    if len(text) <= limit:
+        return text
+    cut = text[:limit]
+    # Prefer ending on a sentence, otherwise on a word
+    end = max(cut.rfind(". "), cut.rfind("! "), cut.rfind("? "))
+    if end > limit // 2:
+        return cut[:end + 1]
+    return cut.rsplit(" ", 1)[0]
+
+
+def fallback_summary(previous, turns, max_tokens):
+    """No-LLM summary: what the user brought up, first sentence each, newest kept."""
+    topics = [re.split(r"(?<=[.!?])\s", user_text.strip(), 1)[0].rstrip(".!?") for user_text, _ in turns]
+    text = f"{previous} The user talked about: {'; '.join(topics)}.".strip()
+    limit = max_tokens * 4
+    if len(text) > limit:
+        text = "..." + text[-limit:].split(" ", 1)[-1]
+    return text
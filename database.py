@@ -1,15 +1,131 @@
+import re
+import queue
+import atexit
 import sqlite3
 import hashlib
+import uuid
+import threading
 from datetime import datetime
 
 DB_NAME = "marie_data.db"
 
+# Chat log group commit: flush when this many rows are waiting, or after this many seconds
+LOG_BATCH_SIZE = 64
+LOG_BATCH_WINDOW = 0.05
+
+# Chat log viewer page size
+LOG_PAGE_SIZE = 200
+
+# RAD retrieval: how many facts go into the prompt, and how much each category counts
+RAD_TOP_K = 5
+RAD_CATEGORY_WEIGHTS = {"preference": 1.2, "user_fact": 1.1, "fact": 1.0, "task": 0.9}
+
+# Words that never help find a fact
+STOPWORDS = {
+    "a", "an", "the", "is", "are", "was", "were", "be", "am", "i", "me", "my", "you", "your",
+    "we", "it", "its", "of", "to", "in", "on", "at", "for", "and", "or", "but", "do", "does",
+    "did", "what", "when", "where", "who", "how", "why", "which", "that", "this", "can",
+    "could", "would", "should", "will", "please", "tell", "about", "hey", "marie"
+}
+
+def _connect(db_name):
+    """Opens a connection tuned for several readers and one writer at a time."""
+    conn = sqlite3.connect(db_name, timeout=10)
+    conn.execute("PRAGMA journal_mode=WAL")
+    # WAL + NORMAL only fsyncs at checkpoints, still safe against app crashes
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA busy_timeout=10000")
+    return conn
+
+
+class _ChatLogWriter(threading.Thread):
+    """Background writer that group-commits chat log inserts.
+
+    log_chat() / log_turn() only enqueue; rows that arrive close together
+    are written in one transaction, so a burst of messages costs a single
+    commit and a user/reply pair is never half-written.
+    """
+
+    def __init__(self, db_name):
+        super().__init__(daemon=True)
+        self.db_name = db_name
+        self.queue = queue.Queue()
+
+    def run(self):
+        conn = _connect(self.db_name)
+        while True:
+            item = self.queue.get()
+            batch, waiters = [], []
+            self._take(item, batch, waiters)
+
+            # Collect whatever else arrives within the batch window
+            while len(batch) < LOG_BATCH_SIZE:
+                try:
+                    self._take(self.queue.get(timeout=LOG_BATCH_WINDOW), batch, waiters)
+                except queue.Empty:
+                    break
+
+            if batch:
+                try:
+                    # OR IGNORE: a row whose idempotency key is already stored was written by an earlier attempt
+                    with conn:
+                        conn.executemany("INSERT OR IGNORE INTO chat_logs (user_id, message_type, content, emotion_tag, turn_id, idempotency_key) "
+                                         "VALUES (?, ?, ?, ?, ?, ?)", batch)
+                except sqlite3.Error as e:
+                    print(f"[DB ERROR] Chat log batch failed: {e}")
+            for event in waiters:
+                event.set()
+
+    def _take(self, item, batch, waiters):
+        if isinstance(item, threading.Event):
+            waiters.append(item)
+        elif isinstance(item, list):
+            # A whole turn: its rows stay together in the same transaction
+            batch.extend(item)
+        else:
+            batch.append(item)
+
+    def flush(self, timeout=5):
+        """Blocks until everything queued so far is committed."""
+        event = threading.Event()
+        self.queue.put(event)
+        event.wait(timeout)
+
+
 class MarieDB:
-    def __init__(self):
-        self.conn = sqlite3.connect(DB_NAME, check_same_thread=False)
-        self.cursor = self.conn.cursor()
+    """Data-access layer shared by the GUI and the servers.
+
+    Each thread gets its own SQLite connection (WAL mode), so the Qt thread,
+    worker threads and the FastAPI threadpool never share cursor state.
+    """
+
+    def __init__(self, db_name=DB_NAME):
+        self.db_name = db_name
+        self._local = threading.local()
         self.create_tables()
 
+        self.log_writer = _ChatLogWriter(db_name)
+        self.log_writer.start()
+        atexit.register(self.flush)
+
+    @property
+    def conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = _connect(self.db_name)
+            self._local.conn = conn
+            self._local.cursor = conn.cursor()
+        return conn
+
+    @property
+    def cursor(self):
+        self.conn
+        return self._local.cursor
+
+    def flush(self):
+        """Waits for queued chat log writes to reach the database."""
+        self.log_writer.flush()
+
     def create_tables(self):
         """Initialize the 5 required structures (Tables)"""
         
@@ -42,10 +158,25 @@ class MarieDB:
                 content TEXT,
                 emotion_tag TEXT, -- e.g. [happy]
                 timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                turn_id TEXT, -- shared by a user message and its reply
+                idempotency_key TEXT, -- unique per message, see log_turn
                 FOREIGN KEY(user_id) REFERENCES users(id)
             )
         ''')
 
+        # Keyset pagination and per-user scans of the chat log
+        self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_chat_logs_user_id ON chat_logs(user_id, id)")
+
+        # One row per message, even if a turn is submitted twice. Databases
+        # created before these columns existed get them added in place; old
+        # rows keep NULL keys, which the unique index allows.
+        self.cursor.execute("PRAGMA table_info(chat_logs)")
+        columns = {row[1] for row in self.cursor.fetchall()}
+        for column in ("turn_id", "idempotency_key"):
+            if column not in columns:
+                self.cursor.execute(f"ALTER TABLE chat_logs ADD COLUMN {column} TEXT")
+        self.cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_chat_logs_idempotency ON chat_logs(idempotency_key)")
+
         # 3 & 4. CONFIGURATION (Voice & Character Settings)
         # We store the *paths* and *preferences*, not the files themselves.
         self.cursor.execute('''
@@ -67,8 +198,57 @@ class MarieDB:
                 confidence_score REAL DEFAULT 1.0
             )
         ''')
+
+        # Full-text index over rad_memory so only relevant facts reach the prompt.
+        # Kept in sync by add_rad_data / delete_rad_data.
+        try:
+            self.cursor.execute('''
+                CREATE VIRTUAL TABLE IF NOT EXISTS rad_memory_fts USING fts5(
+                    key_data, value_data, content='rad_memory', content_rowid='id'
+                )
+            ''')
+            self.fts_enabled = True
+            self._sync_fts("rad_memory", "rad_memory_fts")
+        except sqlite3.OperationalError as e:
+            print(f"[DB] FTS5 unavailable, using keyword scan for RAD memory: {e}")
+            self.fts_enabled = False
+
+        # Full-text search over chat messages for the log viewer. Chat rows are
+        # inserted in batches by the log writer, so triggers keep this in sync.
+        if self.fts_enabled:
+            self.cursor.execute('''
+                CREATE VIRTUAL TABLE IF NOT EXISTS chat_logs_fts USING fts5(
+                    content, content='chat_logs', content_rowid='id'
+                )
+            ''')
+            self.cursor.execute('''
+                CREATE TRIGGER IF NOT EXISTS chat_logs_ai AFTER INSERT ON chat_logs BEGIN
+                    INSERT INTO chat_logs_fts (rowid, content) VALUES (new.id, new.content);
+                END
+            ''')
+            self.cursor.execute('''
+                CREATE TRIGGER IF NOT EXISTS chat_logs_ad AFTER DELETE ON chat_logs BEGIN
+                    INSERT INTO chat_logs_fts (chat_logs_fts, rowid, content) VALUES ('delete', old.id, old.content);
+                END
+            ''')
+            self.cursor.execute('''
+                CREATE TRIGGER IF NOT EXISTS chat_logs_au AFTER UPDATE OF content ON chat_logs BEGIN
+                    INSERT INTO chat_logs_fts (chat_logs_fts, rowid, content) VALUES ('delete', old.id, old.content);
+                    INSERT INTO chat_logs_fts (rowid, content) VALUES (new.id, new.content);
+                END
+            ''')
+            self._sync_fts("chat_logs", "chat_logs_fts")
         self.conn.commit()
 
+    def _sync_fts(self, table, fts_table):
+        """Builds a full-text index once for databases created before it existed."""
+        self.cursor.execute(f"SELECT COUNT(*) FROM {table}")
+        total = self.cursor.fetchone()[0]
+        self.cursor.execute(f"SELECT COUNT(*) FROM {fts_table}_docsize")
+        indexed = self.cursor.fetchone()[0]
+        if total != indexed:
+            self.cursor.execute(f"INSERT INTO {fts_table}({fts_table}) VALUES('rebuild')")
+
     # --- AUTHENTICATION METHODS ---
     def register_user(self, username, password):
         try:
@@ -105,9 +285,52 @@ class MarieDB:
 
     # --- LOGGING METHODS ---
     def log_chat(self, user_id, sender, text, emotion="neutral"):
-        self.cursor.execute("INSERT INTO chat_logs (user_id, message_type, content, emotion_tag) VALUES (?, ?, ?, ?)",
-                            (user_id, sender, text, emotion))
-        self.conn.commit()
+        # Queued for the background writer; committed together with nearby rows
+        self.log_writer.queue.put((user_id, sender, text, emotion, None, None))
+
+    def log_turn(self, user_id, user_text, reply, emotion="neutral", turn_id=None, idempotency_key=None):
+        """Queues a user message and MARIE's reply to be written in one transaction.
+
+        Each row's idempotency key is `idempotency_key` plus the sender, so
+        logging the same turn again (a retried request) adds nothing. With
+        reply None (no reply text at all) only the user message is written.
+        """
+        turn_id = turn_id or uuid.uuid4().hex
+        key = idempotency_key or f"{user_id}:{turn_id}"
+        rows = [(user_id, "user", user_text, "neutral", turn_id, f"{key}:user")]
+        if reply is not None:
+            rows.append((user_id, "marie", reply, emotion, turn_id, f"{key}:marie"))
+        self.log_writer.queue.put(rows)
+
+    def fetch_chat_logs(self, user_id, before_id=None, limit=LOG_PAGE_SIZE, search=None):
+        """One page of a user's chat log, newest first.
+
+        Keyset pagination: pass the smallest id of the previous page as
+        before_id. `search` filters by full-text match on the message.
+        """
+        self.flush()
+        sql = "SELECT c.id, c.timestamp, c.message_type, c.content, c.emotion_tag FROM chat_logs c"
+        where = ["c.user_id = ?"]
+        params = [user_id]
+
+        terms = re.findall(r"\w+", search or "")
+        if terms and self.fts_enabled:
+            sql += " JOIN chat_logs_fts f ON f.rowid = c.id"
+            where.append("chat_logs_fts MATCH ?")
+            params.append(" ".join(f'"{t}"*' for t in terms))
+        elif terms:
+            for t in terms:
+                where.append("c.content LIKE ?")
+                params.append(f"%{t}%")
+
+        if before_id is not None:
+            where.append("c.id < ?")
+            params.append(before_id)
+
+        sql += " WHERE " + " AND ".join(where) + " ORDER BY c.id DESC LIMIT ?"
+        params.append(limit)
+        self.cursor.execute(sql, params)
+        return self.cursor.fetchall()
 
     # --- SETTINGS METHODS ---
     def save_preference(self, user_id, voice_id=None, model_path=None):
@@ -126,10 +349,23 @@ class MarieDB:
         self.cursor.execute("SELECT preferred_voice_id, preferred_model_path FROM user_settings WHERE user_id=?", (user_id,))
         return self.cursor.fetchone()
 
+    def get_last_active_voice(self):
+        """Voice persona of the most recently logged-in user (used to prewarm the voice server)."""
+        self.cursor.execute('''
+            SELECT us.preferred_voice_id FROM sessions s
+            JOIN user_settings us ON us.user_id = s.user_id
+            ORDER BY s.id DESC LIMIT 1
+        ''')
+        row = self.cursor.fetchone()
+        return row[0] if row else None
+
     # --- RAD / DATA METHODS ---
     def add_rad_data(self, category, key, value):
         self.cursor.execute("INSERT INTO rad_memory (category, key_data, value_data) VALUES (?, ?, ?)",
                             (category, key, value))
+        if self.fts_enabled:
+            self.cursor.execute("INSERT INTO rad_memory_fts (rowid, key_data, value_data) VALUES (?, ?, ?)",
+                                (self.cursor.lastrowid, key, value))
         self.conn.commit()
 
     def get_all_rad_data(self):
@@ -143,16 +379,63 @@ class MarieDB:
         # Format: "key: value"
         context_list = [f"{row[0]}: {row[1]}" for row in rows]
         return "\n".join(context_list)
+
+    def search_rad_data(self, query, k=RAD_TOP_K):
+        """Returns only the k facts most relevant to `query`, in the same "key: value" format.
+
+        Text relevance (BM25) is weighted by confidence_score and category.
+        """
+        terms = [t for t in re.findall(r"\w+", (query or "").lower()) if t not in STOPWORDS]
+        if not terms:
+            return ""
+
+        if self.fts_enabled:
+            # Prefix match so "birthdays" still finds "birthday"
+            match = " OR ".join(f'"{t}"*' for t in dict.fromkeys(terms))
+            self.cursor.execute('''
+                SELECT r.id, r.key_data, r.value_data, r.category, r.confidence_score,
+                       -bm25(rad_memory_fts) AS relevance
+                FROM rad_memory_fts JOIN rad_memory r ON r.id = rad_memory_fts.rowid
+                WHERE rad_memory_fts MATCH ?
+                ORDER BY bm25(rad_memory_fts) LIMIT ?
+            ''', (match, k * 4))
+            candidates = self.cursor.fetchall()
+        else:
+            self.cursor.execute("SELECT id, key_data, value_data, category, confidence_score FROM rad_memory")
+            candidates = []
+            for row in self.cursor.fetchall():
+                words = set(re.findall(r"\w+", f"{row[1]} {row[2]}".lower()))
+                hits = sum(1 for t in terms if t in words)
+                if hits:
+                    candidates.append(row + (float(hits),))
+
+        scored = []
+        for rad_id, key, value, category, confidence, relevance in candidates:
+            weight = RAD_CATEGORY_WEIGHTS.get(category, 1.0)
+            scored.append((relevance * (confidence or 1.0) * weight, rad_id, key, value))
+
+        # Highest score first; ties broken by id so the prompt stays stable
+        scored.sort(key=lambda r: (-r[0], r[1]))
+        return "\n".join(f"{key}: {value}" for _, _, key, value in scored[:k])
     
     # --- DELETE METHODS ---
     def delete_chat_log(self, log_id):
+        self.flush()
         self.cursor.execute("DELETE FROM chat_logs WHERE id=?", (log_id,))
         self.conn.commit()
 
     def delete_rad_data(self, rad_id):
+        if self.fts_enabled:
+            # External-content FTS needs the old values to remove them from the index
+            self.cursor.execute("SELECT key_data, value_data FROM rad_memory WHERE id=?", (rad_id,))
+            row = self.cursor.fetchone()
+            if row:
+                self.cursor.execute("INSERT INTO rad_memory_fts (rad_memory_fts, rowid, key_data, value_data) VALUES ('delete', ?, ?, ?)",
+                                    (rad_id, row[0], row[1]))
         self.cursor.execute("DELETE FROM rad_memory WHERE id=?", (rad_id,))
         self.conn.commit()
     
     def clear_all_chats(self, user_id):
+        self.flush()
         self.cursor.execute("DELETE FROM chat_logs WHERE user_id=?", (user_id,))
         self.conn.commit()
@@ -1,64 +1,70 @@
 import os
 import time
-import spacy
 import speech_recognition as sr
 import keyboard 
-from collections import deque
 from PyQt5.QtCore import QThread, pyqtSignal
+from stream_asr import StreamingTranscriber, MicCapture, SAMPLE_RATE, FRAME_SAMPLES
+from wake_word import WakeWordDetector
+from context_keywords import ContextBrain
 
-# Check for GPU
-try:
-    import torch
-    from faster_whisper import WhisperModel
-    DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
-    COMPUTE_TYPE = "float16" if DEVICE == "cuda" else "int8"
-except ImportError:
-    DEVICE = "cpu"
-    COMPUTE_TYPE = "int8"
-
-nlp = spacy.load("en_core_web_sm")
+# Filled in by load_whisper(); torch and faster_whisper take seconds to import,
+# so they are only imported on the worker thread that needs them.
+DEVICE = None
+COMPUTE_TYPE = None
 
-class ContextBrain:
-    def __init__(self, max_history=3):
-        self.history = deque(maxlen=max_history)
-        self.keywords = set()
 
-    def update(self, text):
-        doc = nlp(text)
-        new_keywords = {token.text for token in doc if token.pos_ in ["NOUN", "PROPN"]}
-        self.keywords.update(new_keywords)
-        self.history.append(text)
-        if len(self.keywords) > 15:
-            self.keywords = set(list(self.keywords)[-15:])
-
-    def get_prompt(self):
-        if not self.keywords: return "General conversation."
-        return f"Context: {', '.join(self.keywords)}."
+def load_whisper(model_size):
+    global DEVICE, COMPUTE_TYPE
+    from faster_whisper import WhisperModel
+    # Check for GPU
+    try:
+        import torch
+        DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
+    except ImportError:
+        DEVICE = "cpu"
+    COMPUTE_TYPE = "float16" if DEVICE == "cuda" else "int8"
+    return WhisperModel(model_size, device=DEVICE, compute_type=COMPUTE_TYPE)
 
 
 class VoiceWorker(QThread):
     text_received = pyqtSignal(str)     
     status_update = pyqtSignal(str)     
+    speech_started = pyqtSignal()       # user started talking (barge-in)
+    partial_text = pyqtSignal(str)      # running hypothesis while the user is still talking
+    ready = pyqtSignal(bool)            # Whisper finished loading (False if it failed)
 
-    def __init__(self, model_size="base", wake_word="hey"):
+    def __init__(self, model_size="base", wake_word="hey", latency_profile=None):
         super().__init__()
         self.wake_word = wake_word.lower()
         self.is_active = False          
         self.keyword_mode = False       
         self.running = True
         self.model_size = model_size
+        # "fast" / "balanced" / "accurate" (see stream_asr.LATENCY_PROFILES);
+        # the default depends on the device, which is known once Whisper loads
+        self.latency_profile = latency_profile or os.environ.get("MARIE_ASR_PROFILE")
         
     def run(self):
-        self.status_update.emit(f"Loading Whisper ({DEVICE})...")
-        model = WhisperModel(self.model_size, device=DEVICE, compute_type=COMPUTE_TYPE)
+        self.status_update.emit("Loading Whisper...")
+        try:
+            model = load_whisper(self.model_size)
+        except Exception as e:
+            print(f"[Voice Error] Whisper failed to load: {e}")
+            self.status_update.emit("Error")
+            self.ready.emit(False)
+            return
+        if not self.latency_profile:
+            self.latency_profile = "accurate" if DEVICE == "cuda" else "balanced"
         brain = ContextBrain()
-        
-        r = sr.Recognizer()
-        r.pause_threshold = 0.8
-        r.dynamic_energy_adjustment_damping = 0.15
-        mic = sr.Microphone()
 
-        self.status_update.emit("Voice Ready (Press F4 to Toggle)")
+        transcriber = StreamingTranscriber(model, self.latency_profile, pause_threshold=0.8, max_phrase=10)
+        capture = MicCapture(sr.Microphone(sample_rate=SAMPLE_RATE, chunk_size=FRAME_SAMPLES))
+        # Cheap first stage for keyword mode: Whisper only runs on phrases that
+        # start with something sounding like the wake word
+        detector = WakeWordDetector(self.wake_word)
+
+        self.status_update.emit(f"Voice Ready on {DEVICE} (Press F4 to Toggle)")
+        self.ready.emit(True)
 
         while self.running:
             # 1. CHECK IF ACTIVE
@@ -68,45 +74,50 @@ class VoiceWorker(QThread):
             #   b) We are in 'Keyword Mode' (always listening, filtering for wake word)
             
             if not self.is_active and not self.keyword_mode:
+                if capture.running:
+                    capture.stop()
+                    transcriber.reset()
+                    self.status_update.emit("Idle")
                 time.sleep(0.2)
                 continue
 
             try:
-                current_prompt = brain.get_prompt()
-                
-                with mic as source:
-                    if r.energy_threshold == 300: 
-                        r.adjust_for_ambient_noise(source, duration=0.5)
-
+                if not capture.running:
+                    capture.start()
                     self.status_update.emit("Listening...")
-                    audio = r.listen(source, timeout=5, phrase_time_limit=10) 
-                
-                self.status_update.emit("Transcribing...")
-                
-                with open("temp_audio.wav", "wb") as f:
-                    f.write(audio.get_wav_data())
-
-                segments, _ = model.transcribe(
-                    "temp_audio.wav", 
-                    beam_size=5, 
-                    initial_prompt=current_prompt
-                )
-                
-                text = "".join([s.text for s in segments]).strip()
-                
-                if os.path.exists("temp_audio.wav"): os.remove("temp_audio.wav")
-
-                if text:
-                    brain.update(text)
-                    self.process_text(text)
-                
-                self.status_update.emit("Idle")
-
-            except sr.WaitTimeoutError:
-                pass 
+
+                frame = capture.read(timeout=0.5)
+                if frame is None:
+                    continue
+
+                # Partial hypotheses only make sense when the mic is on for us;
+                # in keyword mode they would just burn CPU on ambient talk.
+                transcriber.partials = self.is_active
+                transcriber.gate = None if self.is_active else detector.detect
+
+                for event, text in transcriber.feed(frame, prompt=brain.get_prompt()):
+                    if event == "start":
+                        # Speech onset: lets the GUI cut MARIE off right away
+                        if self.is_active:
+                            self.speech_started.emit()
+                    elif event == "partial":
+                        self.partial_text.emit(text)
+                    elif event == "final":
+                        brain.update(text)
+                        # Until the detector has MAX_TEMPLATES samples, keep learning
+                        # from phrases where Whisper confirmed the wake word
+                        if (not self.is_active and not detector.full()
+                                and self.wake_word in text.lower()):
+                            detector.enroll_from_phrase(model, transcriber.last_phrase)
+                        self.process_text(text)
+                        self.status_update.emit("Listening...")
+
             except Exception as e:
                 print(f"[Voice Error] {e}")
                 self.status_update.emit("Error")
+                transcriber.reset()
+
+        capture.stop()
 
     def process_text(self, text):
         clean_text = text.lower()
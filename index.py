@@ -1,26 +1,132 @@
+import os
 import ollama
 
-def get_marie_response_stream(prompt, memory_context=""):
-    """Streams responses from Ollama with memory context injected."""
+MODEL = 'llama3'
+
+# Keeps llama3 loaded between requests so its KV cache survives (Ollama's
+# default unloads after 5 minutes idle). "-1" keeps it loaded for good.
+KEEP_ALIVE = os.environ.get("MARIE_OLLAMA_KEEP_ALIVE", "30m")
+if KEEP_ALIVE.lstrip("-").isdigit():
+    KEEP_ALIVE = int(KEEP_ALIVE)
+
+# Connections the async client keeps open to Ollama (one per concurrent stream)
+MAX_CONNECTIONS = int(os.environ.get("MARIE_OLLAMA_CONNECTIONS", "8"))
+
+_async_client = None
+
+# Never changes at runtime: this is the prefix Ollama can reuse on every turn
+PERSONA = "You are MARIE. Be concise. Use emotions like [happy]."
+
+
+def build_messages(prompt, memory_context="", history=None):
+    """Lays out the prompt so consecutive turns share the longest possible prefix.
+
+    1. persona      fixed text, identical for every request
+    2. history      rolling summary + recent turns; only grows at the end
+    3. memory       facts retrieved for this message (changes every turn)
+    4. user turn
+
+    Memory comes after history because it is retrieved per message; placed
+    before history it would change the prefix and force a full prefill.
+    """
+    messages = [{'role': 'system', 'content': PERSONA}]
+    messages.extend(history or [])
+    if memory_context:
+        # Sorted so the same facts always produce the same text
+        facts = "\n".join(sorted(memory_context.splitlines()))
+        messages.append({'role': 'system', 'content': f"Facts about the user you remember:\n{facts}"})
+    messages.append({'role': 'user', 'content': prompt})
+    return messages
+
+
+def get_marie_response_stream(prompt, memory_context="", history=None, stats=None):
+    """Streams responses from Ollama with memory context injected.
+
+    history is a list of earlier chat messages (see conversation.py). If a
+    `stats` dict is passed, it is filled with Ollama's timing counters from
+    the final chunk (prompt_eval_* = prefill, eval_* = generation).
+    """
     try:
         if not prompt: return iter([""])
-        
-        system_instructions = "You are MARIE. Be concise. Use emotions like [happy]."
-        if memory_context:
-            system_instructions += f"\nFacts about the user you remember:\n{memory_context}"
+
+        messages = build_messages(prompt, memory_context, history)
+        if stats is not None:
+            stats['prompt_chars'] = sum(len(m['content']) for m in messages)
 
         stream = ollama.chat(
-            model='llama3', 
-            messages=[
-                {'role': 'system', 'content': system_instructions},
-                {'role': 'user', 'content': prompt}
-            ],
-            stream=True 
+            model=MODEL,
+            messages=messages,
+            stream=True,
+            keep_alive=KEEP_ALIVE
         )
-        
+
         for chunk in stream:
+            if stats is not None and chunk.get('done'):
+                for field in ('prompt_eval_count', 'prompt_eval_duration', 'eval_count',
+                              'eval_duration', 'load_duration', 'total_duration'):
+                    stats[field] = chunk.get(field) or 0
+            yield chunk['message']['content']
+
+    except Exception as e:
+        print(f"Ollama Error: {e}")
+        yield "I am having trouble connecting to my brain."
+
+
+def get_async_client():
+    """Shared ollama.AsyncClient; its HTTP connections are pooled and reused across requests."""
+    global _async_client
+    if _async_client is None:
+        import httpx
+        _async_client = ollama.AsyncClient(limits=httpx.Limits(max_connections=MAX_CONNECTIONS,
+                                                               max_keepalive_connections=MAX_CONNECTIONS))
+    return _async_client
+
+
+async def get_marie_response_stream_async(prompt, memory_context="", history=None, stats=None):
+    """Async version of get_marie_response_stream, for the brain server's event loop."""
+    try:
+        if not prompt:
+            yield ""
+            return
+
+        messages = build_messages(prompt, memory_context, history)
+        if stats is not None:
+            stats['prompt_chars'] = sum(len(m['content']) for m in messages)
+
+        stream = await get_async_client().chat(
+            model=MODEL,
+            messages=messages,
+            stream=True,
+            keep_alive=KEEP_ALIVE
+        )
+
+        async for chunk in stream:
+            if stats is not None and chunk.get('done'):
+                for field in ('prompt_eval_count', 'prompt_eval_duration', 'eval_count',
+                              'eval_duration', 'load_duration', 'total_duration'):
+                    stats[field] = chunk.get(field) or 0
             yield chunk['message']['content']
-            
+
     except Exception as e:
         print(f"Ollama Error: {e}")
-        yield "I am having trouble connecting to my brain."
\ No newline at end of file
+        yield "I am having trouble connecting to my brain."
+
+
+def summarize_conversation(previous_summary, turns, max_tokens=200):
+    """Folds older turns into a short running summary (used off the request path)."""
+    transcript = "\n".join(f"User: {u}\nMARIE: {r}" for u, r in turns)
+    instructions = (f"Summarize this conversation between a user and MARIE in under {max_tokens * 3 // 4} words. "
+                    "Keep names, facts about the user, decisions and open questions. "
+                    "Write plain sentences, no emotion tags.")
+    content = f"Summary so far: {previous_summary}\n\nNew turns:\n{transcript}" if previous_summary else transcript
+
+    response = ollama.chat(
+        model=MODEL,
+        messages=[
+            {'role': 'system', 'content': instructions},
+            {'role': 'user', 'content': content}
+        ],
+        options={'num_predict': max_tokens},
+        keep_alive=KEEP_ALIVE
+    )
+    return response['message']['content']
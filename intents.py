@@ -0,0 +1,59 @@
+import re
+from collections import namedtuple
+
+Intent = namedtuple("Intent", ["name", "slots", "text"])
+
+# Declarative command table, in priority order. A pattern must match the whole
+# (normalised) utterance; {slot} captures free text. Commands only fire when
+# the utterance *is* a command, so "mute" inside an ordinary sentence does not.
+INTENTS = [
+    ("scan_apps",   [r"(?:scan|update|refresh|rescan) (?:my |the )?apps?(?: list)?"]),
+    ("play_video",  [r"play {query}"]),
+    ("write_note",  [r"(?:take a note|write|note|type)(?: down)?:? {content}"]),
+    ("volume_up",   [r"(?:turn )?(?:the )?volume up", r"(?:turn up|increase|raise) (?:the )?volume"]),
+    ("volume_down", [r"(?:turn )?(?:the )?volume down", r"(?:turn down|decrease|lower) (?:the )?volume"]),
+    ("mute",        [r"(?:un)?mute(?: (?:the )?(?:sound|audio|volume|computer|pc))?"]),
+    ("open_app",    [r"open {app}"]),
+    ("close_app",   [r"close {app}"]),
+]
+
+SLOT_PATTERN = re.compile(r"\{(\w+)\}")
+
+# Politeness around a command: "hey marie, could you please open steam now?"
+# Both are part of the compiled pattern, so they cost no extra pass.
+PREFIX = r"(?:(?:hey|ok|okay|hi) )?(?:marie[, ]+)?(?:(?:can|could|would|will) you |please )*"
+SUFFIX = r"(?:,? (?:please|now|for me|thanks|thank you))*[.!?,; ]*"
+
+
+class IntentRouter:
+    """Compiles an intent table into one regex and matches utterances in a single pass.
+
+    Every pattern becomes a branch of one anchored alternation (wrapped in the
+    politeness prefix/suffix); the named group of the branch that matched
+    tells which intent it was, and slot groups are namespaced per branch
+    (i3_0_app) so names never clash. Adding intents does not add passes.
+    """
+
+    def __init__(self, table=INTENTS):
+        self.names = {}        # group name -> intent name
+        self.slots = {}        # group name -> [(slot group, slot name)]
+        branches = []
+        for index, (name, patterns) in enumerate(table):
+            for n, pattern in enumerate(patterns):
+                group = f"i{index}_{n}"
+                self.names[group] = name
+                self.slots[group] = [(f"{group}_{slot}", slot) for slot in SLOT_PATTERN.findall(pattern)]
+                body = SLOT_PATTERN.sub(lambda m: f"(?P<{group}_{m.group(1)}>.+?)", pattern)
+                branches.append(f"(?P<{group}>{body})")
+        self.pattern = re.compile(r"^" + PREFIX + r"(?:" + "|".join(branches) + r")" + SUFFIX + r"$")
+
+    def route(self, text):
+        """Returns the Intent for a command, or None for ordinary conversation."""
+        if not text:
+            return None
+        match = self.pattern.match(" ".join(text.lower().split()))
+        if not match:
+            return None
+        group = match.lastgroup
+        slots = {slot: match.group(slot_group).strip() for slot_group, slot in self.slots[group]}
+        return Intent(self.names[group], slots, match.group(group))
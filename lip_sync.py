@@ -0,0 +1,88 @@
+import time
+import queue
+import threading
+
+# How often a pending job is polled while waiting for it to start playing
+POLL_INTERVAL = 0.05
+
+
+class LipSyncFollower:
+    """Drives the avatar mouth from the voice server's per-utterance envelope.
+
+    Each queued /speak job is followed in order. Once a job is playing, its
+    envelope, start time and duration are kept as one immutable tuple, and
+    mouth_value() just indexes it by the playback clock. The voice server
+    runs on the same machine, so both sides share time.time().
+    """
+
+    def __init__(self, speak_url, session):
+        self.speak_url = speak_url
+        self.session = session
+        self.jobs = queue.Queue()
+        self.track = None          # (job_id, started_at, fps, envelope, duration)
+        self.generation = 0
+        self.pending = 0
+        self.lock = threading.Lock()
+        threading.Thread(target=self._follow, daemon=True).start()
+
+    def add_job(self, job_id):
+        with self.lock:
+            self.pending += 1
+            self.jobs.put((self.generation, job_id))
+
+    def reset(self):
+        """Forget every job (used on interrupt)."""
+        with self.lock:
+            self.generation += 1
+            self.pending = 0
+            self.track = None
+        while True:
+            try: self.jobs.get_nowait()
+            except queue.Empty: break
+
+    def is_active(self):
+        return self.pending > 0 or self._current_value(time.time()) is not None
+
+    def mouth_value(self, now=None):
+        value = self._current_value(now or time.time())
+        return value or 0.0
+
+    def _current_value(self, now):
+        track = self.track
+        if not track:
+            return None
+        _, started_at, fps, envelope, duration = track
+        elapsed = now - started_at
+        if elapsed < 0 or elapsed >= duration or not envelope:
+            return None
+        return envelope[min(int(elapsed * fps), len(envelope) - 1)]
+
+    def _follow(self):
+        while True:
+            generation, job_id = self.jobs.get()
+            try:
+                job = self._wait_until_playing(generation, job_id)
+                if job and generation == self.generation:
+                    self.track = (job_id, job["started_at"], job["envelope_fps"],
+                                  job["envelope"], job["duration"])
+                    # Hold this track until the audio ends, then move to the next job
+                    remaining = job["started_at"] + job["duration"] - time.time()
+                    if remaining > 0:
+                        time.sleep(remaining)
+            except Exception as e:
+                print(f"[LIPSYNC] {e}")
+            finally:
+                with self.lock:
+                    if generation == self.generation:
+                        self.pending = max(0, self.pending - 1)
+
+    def _wait_until_playing(self, generation, job_id):
+        while generation == self.generation:
+            job = self.session.get(f"{self.speak_url}/{job_id}", timeout=2).json()
+            status = job.get("status")
+            if status in ("playing", "done") and job.get("started_at"):
+                return job
+            if status in ("cancelled", "error", None):
+                return None
+            time.sleep(POLL_INTERVAL)
+        return None
@@ -1,34 +1,41 @@
+import time
+_PROCESS_T0 = time.perf_counter()
 import sys
 import requests  
 import os
 import threading
-import pygame
-import math
-import time
-import random
+import uuid
 import keyboard
 from hear import VoiceWorker
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                              QHBoxLayout, QTextEdit, QLineEdit, QPushButton, QLabel, QFrame,
                              QDialog, QTabWidget, QFormLayout, QComboBox, QTableWidget, 
-                             QTableWidgetItem, QHeaderView, QMessageBox, QFileDialog)
-from PyQt5.QtCore import pyqtSignal, Qt, QObject, QTimer
-
-# --- LIVE2D IMPORT ---
-try:
-    from live2d import v3 as live2d
-    from pygame.locals import *
-    import win32gui
-    import win32con
-except ImportError:
-    print("[CRITICAL] Libraries missing. Ensure live2d, pygame, and pywin32 are installed.")
+                             QTableWidgetItem, QHeaderView, QMessageBox, QFileDialog, QTableView)
+from PyQt5.QtCore import pyqtSignal, Qt, QObject, QTimer, QAbstractTableModel, QModelIndex
 
 ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
 sys.path.append(ROOT_DIR)
 
 from action import ActionHandler
-from database import MarieDB
+from database import MarieDB, LOG_PAGE_SIZE
 from voice_db import CHARACTERS 
+from sentence_stream import SentenceSplitter
+from lip_sync import LipSyncFollower
+from startup import StartupReport, wait_for_health
+from avatar_render import AvatarRenderer
+from tracing import get_tracer, new_trace_id
+
+# Stages that run in parallel once the window is up: (report name, indicator label)
+READINESS = [
+    ("brain server", "Brain"),
+    ("voice server", "Voice"),
+    ("whisper", "Whisper"),
+    ("avatar", "Avatar"),
+]
+STARTUP = StartupReport(["imports", "database", "window"] + [name for name, _ in READINESS],
+                        t0=_PROCESS_T0)
+STARTUP.end("imports")
+tracer = get_tracer("gui")
 
 # 1. LOGIN DIALOG
 class LoginDialog(QDialog):
@@ -92,6 +99,72 @@ class LoginDialog(QDialog):
 
 # 2. SETTINGS DASHBOARD 
 
+class ChatLogModel(QAbstractTableModel):
+    """Lazy chat log table: loads one page at a time as the view scrolls."""
+
+    HEADERS = ["ID", "Time", "Sender", "Message", "Emotion"]
+
+    def __init__(self, db, user_id, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self.user_id = user_id
+        self.rows = []
+        self.search = ""
+        self.exhausted = False
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and index.isValid():
+            return str(self.rows[index.row()][index.column()])
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return None
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self.exhausted
+
+    def fetchMore(self, parent=QModelIndex()):
+        before_id = self.rows[-1][0] if self.rows else None
+        page = self.db.fetch_chat_logs(self.user_id, before_id=before_id, search=self.search)
+        if len(page) < LOG_PAGE_SIZE:
+            self.exhausted = True
+        if not page:
+            return
+        self.beginInsertRows(QModelIndex(), len(self.rows), len(self.rows) + len(page) - 1)
+        self.rows.extend(page)
+        self.endInsertRows()
+
+    def refresh(self, search=None):
+        """Drops loaded pages and starts again from the newest message."""
+        if search is not None:
+            self.search = search
+        self.beginResetModel()
+        self.rows = []
+        self.exhausted = False
+        self.endResetModel()
+
+    def remove_row(self, row):
+        log_id = self.rows[row][0]
+        self.db.delete_chat_log(log_id)
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self.rows[row]
+        self.endRemoveRows()
+
+    def clear(self):
+        self.beginResetModel()
+        self.rows = []
+        self.exhausted = True
+        self.endResetModel()
+
+
 class SettingsWindow(QDialog):
     def __init__(self, parent_window):
         super().__init__(parent_window)
@@ -158,12 +231,22 @@ class SettingsWindow(QDialog):
     def init_logs_tab(self):
         layout = QVBoxLayout(self.tab_logs)
         
-        self.log_table = QTableWidget()
-        self.log_table.setColumnCount(5)
-        self.log_table.setHorizontalHeaderLabels(["ID", "Time", "Sender", "Message", "Emotion"])
+        self.log_search = QLineEdit()
+        self.log_search.setPlaceholderText("Search messages...")
+        self.log_search.setStyleSheet("background: #333; padding: 5px; color: white;")
+        # Wait for a pause in typing before querying
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(250)
+        self.search_timer.timeout.connect(self.load_logs)
+        self.log_search.textChanged.connect(self.search_timer.start)
+
+        self.log_model = ChatLogModel(self.db, self.uid, self)
+        self.log_table = QTableView()
+        self.log_table.setModel(self.log_model)
         self.log_table.hideColumn(0)
         self.log_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
-        self.log_table.setSelectionBehavior(QTableWidget.SelectRows)
+        self.log_table.setSelectionBehavior(QTableView.SelectRows)
         
         btn_layout = QHBoxLayout()
         refresh_btn = QPushButton("Refresh")
@@ -183,9 +266,9 @@ class SettingsWindow(QDialog):
         btn_layout.addStretch()
         btn_layout.addWidget(clear_btn)
         
+        layout.addWidget(self.log_search)
         layout.addWidget(self.log_table)
         layout.addLayout(btn_layout)
-        self.load_logs()
 
     def init_rad_tab(self):
         layout = QVBoxLayout(self.tab_rad)
@@ -241,26 +324,19 @@ class SettingsWindow(QDialog):
         QMessageBox.information(self, "Saved", "Preferences saved. (Restart may be needed for Model change)")
 
     def load_logs(self):
-        self.db.cursor.execute("SELECT id, timestamp, message_type, content, emotion_tag FROM chat_logs WHERE user_id=? ORDER BY id DESC", (self.uid,))
-        rows = self.db.cursor.fetchall()
-        self.log_table.setRowCount(0)
-        for row_idx, row_data in enumerate(rows):
-            self.log_table.insertRow(row_idx)
-            for col_idx, data in enumerate(row_data):
-                self.log_table.setItem(row_idx, col_idx, QTableWidgetItem(str(data)))
+        # Pages are pulled in by the view through fetchMore as it scrolls
+        self.log_model.refresh(self.log_search.text().strip())
 
     def delete_selected_log(self):
-        row = self.log_table.currentRow()
+        row = self.log_table.currentIndex().row()
         if row >= 0:
-            log_id = self.log_table.item(row, 0).text()
-            self.db.delete_chat_log(log_id)
-            self.log_table.removeRow(row)
+            self.log_model.remove_row(row)
 
     def clear_all_logs(self):
         confirm = QMessageBox.question(self, "Confirm", "Delete ALL your chat history? This cannot be undone.", QMessageBox.Yes | QMessageBox.No)
         if confirm == QMessageBox.Yes:
             self.db.clear_all_chats(self.uid)
-            self.load_logs()
+            self.log_model.clear()
 
     def add_rad_fact(self):
         key = self.rad_key.text()
@@ -292,6 +368,9 @@ class StreamSignals(QObject):
     new_token = pyqtSignal(str)
     finished = pyqtSignal(str)
 
+class StartupSignals(QObject):
+    stage_ready = pyqtSignal(str, bool)
+
 class MainWindow(QMainWindow):
     def __init__(self, user_id, db_instance):
         super().__init__()
@@ -304,10 +383,22 @@ class MainWindow(QMainWindow):
 
         self.brain_url = "http://127.0.0.1:8000/chat"
         self.voice_url = "http://127.0.0.1:8001/speak"
+        self.stop_url = "http://127.0.0.1:8001/stop"
+        self.brain_health_url = "http://127.0.0.1:8000/health"
+        self.voice_health_url = "http://127.0.0.1:8001/health"
+        # requests.Session is not thread-safe: each thread that talks to the
+        # voice server gets its own (see voice_session)
+        self.voice_sessions = threading.local()
         self.actions = ActionHandler()
         self.signals = StreamSignals()
+        # Bumped by every sent message; a reply thread from an older turn stops reading
+        self.turn_epoch = 0
+        self.startup_signals = StartupSignals()
+        self.startup_signals.stage_ready.connect(self.set_stage_ready)
         
-        self.is_speaking_remotely = False
+        # Mouth movement follows the real audio envelope published by the voice server
+        # Its session is only used by its own poller thread
+        self.lip_sync = LipSyncFollower(self.voice_url, requests.Session())
         
         self.model_path = r"d:\pylearn\FYP\AiAssistant\models\kei\runtime\kei_vowels_pro.model3.json"
         self.current_character = "tachyon" 
@@ -319,18 +410,30 @@ class MainWindow(QMainWindow):
             if saved_model: self.model_path = saved_model
 
         self.init_ui()
+        # Last partial transcript shown in the input box (empty once sent or typed over)
+        self.asr_preview = ""
         
         #VOICE INTEGRATION 
         self.voice_thread = VoiceWorker(wake_word="hey")######################WAKE WORD###############################
         self.voice_thread.text_received.connect(self.handle_voice_input)
         self.voice_thread.status_update.connect(self.update_voice_status)
+        self.voice_thread.speech_started.connect(self.interrupt_speech)
+        self.voice_thread.partial_text.connect(self.show_partial_text)
+        self.voice_thread.ready.connect(lambda ok: self.set_stage_ready("whisper", ok))
+        STARTUP.begin("whisper")
         self.voice_thread.start()
         keyboard.add_hotkey('F4', self.voice_thread.toggle_listening)
         
         self.signals.new_token.connect(self.append_token)
         self.signals.finished.connect(self.finalize_response)
 
-        QTimer.singleShot(100, self.init_live2d_embedding)
+        # Whisper (above), the avatar and both servers all come up in parallel.
+        # The avatar starts once the event loop runs, so its parent window exists.
+        self.avatar = None
+        STARTUP.begin("avatar")
+        QTimer.singleShot(0, self.start_avatar)
+        for name, url in (("brain server", self.brain_health_url), ("voice server", self.voice_health_url)):
+            threading.Thread(target=self._wait_for_server, args=(name, url), daemon=True).start()
 
     def init_ui(self):
         central_widget = QWidget()
@@ -357,8 +460,16 @@ class MainWindow(QMainWindow):
         settings_btn.setStyleSheet("background-color: #444; padding: 5px;")
         settings_btn.clicked.connect(self.open_settings)
         
+        # Readiness indicators, grey until each subsystem has started
+        self.ready_labels = {}
+        for name, label in READINESS:
+            self.ready_labels[name] = QLabel(f"\u25cf {label}")
+            self.ready_labels[name].setStyleSheet("color: #555; margin-right: 6px;")
+
         top_bar.addWidget(self.voice_label) 
         top_bar.addWidget(title_label)
+        for name, _ in READINESS:
+            top_bar.addWidget(self.ready_labels[name])
         top_bar.addStretch()
         top_bar.addWidget(settings_btn)
 
@@ -389,118 +500,174 @@ class MainWindow(QMainWindow):
         main_layout.addWidget(right_panel, stretch=1)
         
         
+    def set_stage_ready(self, name, ok):
+        STARTUP.end(name, ok)
+        self.ready_labels[name].setStyleSheet(
+            f"color: {'#4ec9b0' if ok else '#f44747'}; margin-right: 6px;")
+
+    def _wait_for_server(self, name, url):
+        self.startup_signals.stage_ready.emit(name, wait_for_health(url))
+
     def update_voice_status(self, status):
         color = "#4ec9b0" if "Listening" in status else "#888"
         if "ON" in status: color = "#00ff00"
         self.voice_label.setStyleSheet(f"color: {color}; margin-right: 10px;")
         self.voice_label.setText(f"[{status}]")
 
+    def show_partial_text(self, text):
+        # Live preview of what Whisper has heard so far; replaced by the final text.
+        # Never written over something the user is typing.
+        if self.input_field.text() in ("", self.asr_preview):
+            self.input_field.setText(text)
+            self.asr_preview = text
+
     def handle_voice_input(self, text):
         if not text: return
-        
-        self.input_field.setText(text)
-        self.handle_send()    
+
+        # Sent directly, so a half-typed message stays in the box
+        if self.input_field.text() == self.asr_preview:
+            self.input_field.clear()
+        self.asr_preview = ""
+        self.send_message(text)
 
     def open_settings(self):
         dlg = SettingsWindow(self)
         dlg.exec_()
 
-    def init_live2d_embedding(self):
-        pygame.init()
-        os.environ['SDL_VIDEO_WINDOW_POS'] = "%d,%d" % (-1000, -1000)
-        self.screen = pygame.display.set_mode((450, 600), DOUBLEBUF | OPENGL | NOFRAME)
-        
-        pygame_hwnd = pygame.display.get_wm_info()['window']
-        parent_hwnd = int(self.face_container.winId())
-
-        win32gui.SetParent(pygame_hwnd, parent_hwnd)
-        win32gui.SetWindowPos(pygame_hwnd, win32con.HWND_TOP, 0, 0, 450, 600, win32con.SWP_SHOWWINDOW)
-
-        live2d.init()
-        live2d.glInit()
-        
-        if os.path.exists(self.model_path):
-            os.chdir(os.path.dirname(self.model_path))
-            self.model = live2d.LAppModel()
-            self.model.LoadModelJson(self.model_path)
-            self.model.Resize(450, 600)
-            
-        self.t_breath = 0.0
-        self.last_blink = time.time()
-        
-        self.anim_timer = QTimer()
-        self.anim_timer.timeout.connect(self.update_live2d_frame)
-        self.anim_timer.start(16)
-
-    def update_live2d_frame(self):
-        for event in pygame.event.get(): pass
-
-        self.t_breath += 0.05
-        self.model.SetParameterValue("ParamBreath", (math.sin(self.t_breath) + 1) / 2)
-        
-        mouth_val = random.uniform(0.3, 1.0) if self.is_speaking_remotely else 0.0
-        self.model.SetParameterValue("ParamMouthOpenY", mouth_val)
-        
-        self.model.SetParameterValue("Param85", 1.0)
-
-        if time.time() > self.last_blink + 3:
-            self.model.SetParameterValue("ParamEyeLOpen", 0.0)
-            self.model.SetParameterValue("ParamEyeROpen", 0.0)
-            if time.time() > self.last_blink + 3.2:
-                self.last_blink = time.time()
-        else:
-            self.model.SetParameterValue("ParamEyeLOpen", 1.0)
-            self.model.SetParameterValue("ParamEyeROpen", 1.0)
-
-        self.model.Update()
-        live2d.clearBuffer(0.1, 0.1, 0.1, 1.0)
-        self.model.Draw()
-        pygame.display.flip()
+    def start_avatar(self):
+        # Rendering runs on its own thread; the GUI only publishes state to it
+        self.avatar = AvatarRenderer(
+            int(self.face_container.winId()), self.model_path,
+            mouth_source=self.lip_sync.mouth_value,
+            active_source=self.lip_sync.is_active,
+            on_ready=lambda ok: self.startup_signals.stage_ready.emit("avatar", ok))
+        self.avatar.start()
 
     def handle_send(self):
         text = self.input_field.text().strip()
-        if not text: return
+        self.input_field.clear()
+        self.asr_preview = ""
+        self.send_message(text)
 
-        self.db.log_chat(self.current_user_id, "user", text)
+    def send_message(self, text):
+        if not text: return
 
         self.chat_history.append(f"<b style='color: #4ec9b0'>YOU:</b> {text}")
         self.chat_history.append(f"<b style='color: #ce9178'>MARIE:</b> ")
-        self.input_field.clear()
 
-        threading.Thread(target=self.actions.execute, args=(text,), daemon=True).start()
-        threading.Thread(target=self.process_logic, args=(text,), daemon=True).start()
+        # A new message always cuts off whatever MARIE was still saying; the
+        # voice server is told from the turn's own thread (see process_logic)
+        was_speaking = self.lip_sync.is_active()
+        self.lip_sync.reset()
 
-    def process_logic(self, text):
+        threading.Thread(target=self.actions.execute, args=(text,), daemon=True).start()
+        # One trace id per turn, carried through /chat and /speak to both servers
+        trace_id = new_trace_id()
+        self.turn_epoch += 1
+        threading.Thread(target=self.process_logic, args=(text, trace_id, self.turn_epoch, was_speaking),
+                         daemon=True).start()
+
+    def process_logic(self, text, trace_id=None, epoch=None, interrupt=False):
+        # The brain server cancels this user's unfinished reply when the next
+        # message arrives; this thread also stops as soon as it is superseded
+        stale = lambda: epoch is not None and epoch != self.turn_epoch
         try:
+            # Stop the old reply now rather than at this turn's first sentence.
+            # Posted from this thread, so it always lands before that /speak.
+            if interrupt:
+                self._post_stop()
+
             # 1. SEND TO BRAIN (Port 8000)
+            # The brain server logs both messages of the turn. A resend (see
+            # post_to_brain) reuses this turn_id, so nothing is logged twice.
             payload = {
                 "text": text,
-                "user_id": self.current_user_id
+                "user_id": self.current_user_id,
+                "stream": True,
+                "trace_id": trace_id,
+                "turn_id": uuid.uuid4().hex
             }
             
-            response = requests.post(self.brain_url, json=payload).json()
-            ai_reply = response.get("response", "[Error: Brain Empty]")
-            
-            self.signals.new_token.emit(ai_reply)
+            # Tokens are shown as soon as the brain produces them, and every
+            # finished sentence goes to the voice server while the rest is generated
+            ai_reply = ""
+            spoken = False
+            splitter = SentenceSplitter()
+            sent_at = time.time()
+            with tracer.span("gui_turn", trace_id), \
+                    self.post_to_brain(payload) as response:
+                response.raise_for_status()
+                response.encoding = "utf-8"
+                for chunk in response.iter_content(chunk_size=None, decode_unicode=True):
+                    if stale(): break
+                    if not chunk: continue
+                    if not ai_reply:
+                        tracer.record("gui_first_token", sent_at, time.time())
+                    ai_reply += chunk
+                    self.signals.new_token.emit(chunk)
+                    for sentence in splitter.feed(chunk):
+                        # The first sentence also drops anything an older turn queued after the stop
+                        self.queue_speech(sentence, trace_id, interrupt=not spoken)
+                        spoken = True
+                    if self.avatar and splitter.emotion != self.avatar.state.emotion:
+                        self.avatar.publish(emotion=splitter.emotion)
+
+            if stale(): return
+            if not ai_reply:
+                ai_reply = "[Error: Brain Empty]"
+                self.signals.new_token.emit(ai_reply)
             self.signals.finished.emit(ai_reply)
 
-            # 3. SEND TO VOICE (Port 8001)
-            requests.post(self.voice_url, json={
-                "text": ai_reply,
-                "character": self.current_character
-            })
-            
-            self.is_speaking_remotely = True
-            
-            duration = max(1000, len(ai_reply) * 80)
-            QTimer.singleShot(int(duration), self.stop_mouth)
+            # 3. SEND THE TAIL TO VOICE (Port 8001)
+            for sentence in splitter.flush():
+                self.queue_speech(sentence, trace_id, interrupt=not spoken)
+                spoken = True
             
         except Exception as e:
             print(f"Connection Error: {e}")
             self.signals.new_token.emit("[System Error: Brain/Voice server is offline]")
 
-    def stop_mouth(self):
-        self.is_speaking_remotely = False
+    def post_to_brain(self, payload):
+        """POSTs a turn to /chat, resending the same payload once if the connection fails."""
+        try:
+            return requests.post(self.brain_url, json=payload, stream=True)
+        except requests.ConnectionError as e:
+            print(f"[BRAIN] Resending turn {payload.get('turn_id')}: {e}")
+            time.sleep(0.5)
+            return requests.post(self.brain_url, json=payload, stream=True)
+
+    def voice_session(self):
+        """The calling thread's requests.Session for the voice server."""
+        session = getattr(self.voice_sessions, "session", None)
+        if session is None:
+            session = self.voice_sessions.session = requests.Session()
+        return session
+
+    def queue_speech(self, sentence, trace_id=None, interrupt=False):
+        """Queues one sentence on the voice server; returns without waiting for audio.
+
+        With interrupt, the voice server first drops everything queued or playing.
+        """
+        job = self.voice_session().post(self.voice_url, json={
+            "text": sentence,
+            "character": self.current_character,
+            "trace_id": trace_id,
+            "interrupt": interrupt
+        }).json()
+        if job.get("job_id"):
+            self.lip_sync.add_job(job["job_id"])
+
+    def interrupt_speech(self):
+        """Barge-in: asks the voice server to stop talking (non-blocking)."""
+        if not self.lip_sync.is_active(): return
+        self.lip_sync.reset()
+        threading.Thread(target=self._post_stop, daemon=True).start()
+
+    def _post_stop(self):
+        try:
+            self.voice_session().post(self.stop_url, timeout=2)
+        except Exception as e:
+            print(f"[VOICE] Stop failed: {e}")
 
     def append_token(self, token):
         cursor = self.chat_history.textCursor()
@@ -509,26 +676,27 @@ class MainWindow(QMainWindow):
         self.chat_history.setTextCursor(cursor)
 
     def finalize_response(self, full_text):
-        self.db.log_chat(self.current_user_id, "marie", full_text)
-        
         self.chat_history.append("<hr style='background-color: #444; height: 1px; border: 0;'>")
         self.actions.execute(full_text)
 
     def closeEvent(self, event):
         self.db.logout_user(self.current_user_id)
-        live2d.dispose()
-        pygame.quit()
+        if self.avatar: self.avatar.stop()
         event.accept()
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
     
-    db = MarieDB()
+    with STARTUP.stage("database"):
+        db = MarieDB()
     
     login = LoginDialog(db)
-    if login.exec_() == QDialog.Accepted:
-        window = MainWindow(login.user_id, db)
-        window.show()
+    with STARTUP.stage("login"):
+        accepted = login.exec_() == QDialog.Accepted
+    if accepted:
+        with STARTUP.stage("window"):
+            window = MainWindow(login.user_id, db)
+            window.show()
         sys.exit(app.exec_())
     else:       
         sys.exit()
\ No newline at end of file
@@ -4,10 +4,24 @@ echo [MARIE] Starting Brain Server (Port 8000)...
 start /MIN "MARIE Brain" python server_reasoning.py
 echo [MARIE] Starting Voice Server (Port 8001)...
 start /MIN "MARIE Voice" python server_voice.py
-echo [MARIE] Waiting 5 seconds for systems to warm up...
-timeout /t 5 /nobreak >nul
+echo [MARIE] Waiting for servers to report healthy...
+set /a tries=0
+:wait_health
+curl -s -f -o nul http://127.0.0.1:8000/health || goto not_ready
+curl -s -f -o nul http://127.0.0.1:8001/health || goto not_ready
+echo [MARIE] Servers ready.
+goto launch
+:not_ready
+set /a tries+=1
+if %tries% GEQ 120 (
+    echo [MARIE] Servers still starting, launching GUI anyway...
+    goto launch
+)
+timeout /t 1 /nobreak >nul
+goto wait_health
+:launch
 echo [MARIE] Launching Body (GUI)...
 python main.py
 echo [MARIE] Closing all services...
 taskkill /IM python.exe /F
-pause
\ No newline at end of file
+pause
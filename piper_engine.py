@@ -0,0 +1,190 @@
+import os
+import json
+import wave
+import threading
+import subprocess
+from voice_db import PIPER_DIR
+
+PIPER_EXE = os.path.join(PIPER_DIR, "piper.exe")
+
+# Prefer the in-process Piper runtime (pip install piper-tts).
+# If it is missing we fall back to a resident piper.exe fed over a pipe.
+try:
+    from piper.voice import PiperVoice
+    PIPER_LIB_AVAILABLE = True
+except ImportError:
+    PIPER_LIB_AVAILABLE = False
+
+
+def _startupinfo():
+    """Hides the console window of child processes on Windows."""
+    if os.name != "nt":
+        return None
+    info = subprocess.STARTUPINFO()
+    info.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+    return info
+
+
+class _InProcessVoice:
+    """An ONNX voice loaded once inside this process."""
+
+    def __init__(self, model_path):
+        self.voice = PiperVoice.load(model_path)
+        self.sample_rate = self.voice.config.sample_rate
+        self.num_speakers = getattr(self.voice.config, "num_speakers", 1)
+        self.lock = threading.Lock()
+
+    def synthesize(self, text, speaker_id=0, length_scale=1.0):
+        # Single-speaker models reject a speaker id, so only pass it when it means something
+        sid = speaker_id if self.num_speakers > 1 else None
+        with self.lock:
+            if hasattr(self.voice, "synthesize_stream_raw"):
+                chunks = self.voice.synthesize_stream_raw(text, speaker_id=sid, length_scale=length_scale)
+                return b"".join(chunks), self.sample_rate
+
+            # piper-tts >= 1.3 API
+            from piper import SynthesisConfig
+            config = SynthesisConfig(speaker_id=sid, length_scale=length_scale)
+            pcm = b"".join(c.audio_int16_bytes for c in self.voice.synthesize(text, syn_config=config))
+            return pcm, self.sample_rate
+
+    def close(self):
+        self.voice = None
+
+
+class _ResidentProcess:
+    """A long-lived piper.exe that reads JSON lines on stdin.
+
+    The CLI fixes length_scale at launch, so one process is kept per speed.
+    """
+
+    def __init__(self, model_path, length_scale, work_dir):
+        self.work_dir = work_dir
+        self.lock = threading.Lock()
+        self.counter = 0
+        cmd = [
+            PIPER_EXE,
+            "--model", model_path,
+            "--json-input",
+            "--output_dir", work_dir,
+            "--length_scale", str(length_scale)
+        ]
+        self.proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                     stderr=subprocess.DEVNULL, startupinfo=_startupinfo())
+
+    def synthesize(self, text, speaker_id=0):
+        with self.lock:
+            self.counter += 1
+            out_path = os.path.join(self.work_dir, f"piper_{os.getpid()}_{id(self)}_{self.counter}.wav")
+            line = {"text": text, "output_file": out_path}
+            if speaker_id:
+                line["speaker_id"] = speaker_id
+
+            self.proc.stdin.write((json.dumps(line) + "\n").encode("utf-8"))
+            self.proc.stdin.flush()
+            # Piper prints the written path once the utterance is done
+            written = self.proc.stdout.readline().decode("utf-8").strip()
+            if not written:
+                raise RuntimeError("piper.exe exited unexpectedly")
+
+        with wave.open(out_path, "rb") as wf:
+            pcm = wf.readframes(wf.getnframes())
+            rate = wf.getframerate()
+        try: os.remove(out_path)
+        except OSError: pass
+        return pcm, rate
+
+    def is_alive(self):
+        return self.proc.poll() is None
+
+    def close(self):
+        try:
+            self.proc.stdin.close()
+            self.proc.terminate()
+        except Exception:
+            pass
+
+
+class _ExeVoice:
+    """Fallback voice: one resident piper.exe per length_scale."""
+
+    def __init__(self, model_path, work_dir):
+        if not os.path.exists(PIPER_EXE):
+            raise FileNotFoundError("piper.exe not found!")
+        self.model_path = model_path
+        self.work_dir = work_dir
+        self.workers = {}
+        self.lock = threading.Lock()
+
+    def synthesize(self, text, speaker_id=0, length_scale=1.0):
+        key = round(length_scale, 3)
+        with self.lock:
+            worker = self.workers.get(key)
+            if worker is None or not worker.is_alive():
+                worker = _ResidentProcess(self.model_path, key, self.work_dir)
+                self.workers[key] = worker
+        return worker.synthesize(text, speaker_id)
+
+    def close(self):
+        for worker in self.workers.values():
+            worker.close()
+        self.workers.clear()
+
+
+class PiperEngine:
+    """Keeps Piper voices resident so each sentence skips the model load.
+
+    Voices are pooled by their `piper_model` file name from voice_db.CHARACTERS,
+    so switching persona only loads a voice the first time it is used.
+    """
+
+    def __init__(self, work_dir=None):
+        self.work_dir = work_dir or os.path.join(os.path.dirname(__file__), "cache")
+        os.makedirs(self.work_dir, exist_ok=True)
+        self.voices = {}
+        self.lock = threading.Lock()
+        backend = "in-process" if PIPER_LIB_AVAILABLE else "resident piper.exe"
+        print(f"[PIPER] Synthesis backend: {backend}")
+
+    def get_voice(self, piper_model):
+        with self.lock:
+            voice = self.voices.get(piper_model)
+            if voice is None:
+                model_path = os.path.join(PIPER_DIR, piper_model)
+                print(f"[PIPER] Loading voice {piper_model}...")
+                if PIPER_LIB_AVAILABLE:
+                    voice = _InProcessVoice(model_path)
+                else:
+                    voice = _ExeVoice(model_path, self.work_dir)
+                self.voices[piper_model] = voice
+            return voice
+
+    def synthesize(self, piper_model, text, speaker_id=0, length_scale=1.0):
+        """Returns (pcm_bytes, sample_rate) as 16-bit mono PCM."""
+        voice = self.get_voice(piper_model)
+        return voice.synthesize(text, speaker_id=speaker_id, length_scale=length_scale)
+
+    def unload(self, piper_model):
+        with self.lock:
+            voice = self.voices.pop(piper_model, None)
+        if voice:
+            voice.close()
+
+    def close(self):
+        with self.lock:
+            voices = list(self.voices.values())
+            self.voices.clear()
+        for voice in voices:
+            voice.close()
+
+
+# Shared pool so every MarieVoice in a process reuses the same loaded voices
+_engine = None
+_engine_lock = threading.Lock()
+
+def get_engine():
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = PiperEngine()
+        return _engine
@@ -0,0 +1,113 @@
+import os
+import threading
+from collections import OrderedDict
+
+# Memory budget for resident RVC models (MB). Override with MARIE_RVC_CACHE_MB.
+DEFAULT_BUDGET_MB = 1536
+
+
+class RVCEntry:
+    """One loaded RVC model. Inference on it must hold `lock`."""
+
+    def __init__(self, key, engine, size):
+        self.key = key
+        self.engine = engine
+        self.size = size
+        self.lock = threading.Lock()
+
+
+class RVCModelCache:
+    """Keeps converted voices loaded so repeated replies skip load_model().
+
+    Entries are keyed by (rvc_model, rvc_index, device). When the estimated
+    memory (size of the .pth and .index files) goes over the budget, the
+    least recently used model is dropped. The newest model is always kept,
+    even if it alone is bigger than the budget.
+    """
+
+    def __init__(self, factory, budget_mb=None):
+        # factory(device) -> fresh RVCInference
+        self.factory = factory
+        if budget_mb is None:
+            budget_mb = float(os.environ.get("MARIE_RVC_CACHE_MB", DEFAULT_BUDGET_MB))
+        self.budget = int(budget_mb * 1024 * 1024)
+        self.entries = OrderedDict()
+        self.loading = {}         # key -> Event set when its load finishes (or fails)
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _estimate_size(self, model_path, index_path):
+        size = 0
+        for path in (model_path, index_path):
+            if path and os.path.exists(path):
+                size += os.path.getsize(path)
+        return size
+
+    def get(self, model_path, index_path, device, count=True):
+        """Returns a loaded RVCEntry, loading the model on a miss.
+
+        The load itself runs outside the cache lock, so hits on other voices
+        (and stats()) never wait for it. Concurrent requests for the model
+        being loaded wait on that load instead of starting their own.
+        """
+        key = (os.path.basename(model_path), os.path.basename(index_path or ""), device)
+
+        while True:
+            with self.lock:
+                entry = self.entries.get(key)
+                if entry:
+                    if count: self.hits += 1
+                    self.entries.move_to_end(key)
+                    return entry
+                loading = self.loading.get(key)
+                if loading is None:
+                    loading = self.loading[key] = threading.Event()
+                    if count: self.misses += 1
+                    break
+            # Someone else is loading it; if that load fails, the next pass retries
+            loading.wait()
+
+        try:
+            print(f"[RVC CACHE] Loading {key[0]} on {device}...")
+            engine = self.factory(device)
+            engine.load_model(model_path)
+            entry = RVCEntry(key, engine, self._estimate_size(model_path, index_path))
+            with self.lock:
+                self.entries[key] = entry
+                self._evict()
+            return entry
+        finally:
+            with self.lock:
+                del self.loading[key]
+            loading.set()
+
+    def _evict(self):
+        # Caller holds self.lock
+        used = sum(e.size for e in self.entries.values())
+        while used > self.budget and len(self.entries) > 1:
+            key, old = self.entries.popitem(last=False)
+            used -= old.size
+            self.evictions += 1
+            print(f"[RVC CACHE] Evicted {key[0]} ({old.size // (1024 * 1024)} MB)")
+
+    def prewarm(self, model_path, index_path, device):
+        """Loads a model ahead of the first request. Errors are only logged."""
+        try:
+            # A prewarm is not a real request, so it does not touch the counters
+            self.get(model_path, index_path, device, count=False)
+        except Exception as e:
+            print(f"[RVC CACHE] Prewarm failed: {e}")
+
+    def stats(self):
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "resident": [list(k) for k in self.entries],
+                "used_mb": round(sum(e.size for e in self.entries.values()) / (1024 * 1024), 1),
+                "budget_mb": round(self.budget / (1024 * 1024), 1),
+            }
@@ -0,0 +1,188 @@
+import os
+import time
+import asyncio
+from collections import deque
+
+# How many generations the local model serves at once (match OLLAMA_NUM_PARALLEL)
+DEFAULT_MAX_CONCURRENT = 4
+
+# Recent queue waits kept for the /llm/queue summary
+WAIT_SAMPLES = 256
+
+_DONE = object()
+
+
+class Ticket:
+    """One request for a generation slot."""
+
+    def __init__(self, user_id, trace_id=None):
+        self.user_id = user_id
+        self.trace_id = trace_id
+        self.enqueued_at = time.time()
+        self.started_at = None
+        self.granted = asyncio.get_running_loop().create_future()   # True = run, False = superseded
+        self.task = None
+        self.superseded = False
+
+    @property
+    def wait(self):
+        return (self.started_at or time.time()) - self.enqueued_at
+
+
+class LLMScheduler:
+    """Decides which chat request gets to generate next.
+
+    Waiting requests are queued per user and users are served round-robin,
+    so one chatty client cannot starve the others. At most max_concurrent
+    generations run at once. When a user sends a newer message, their
+    queued requests are dropped and their running generation is cancelled:
+    the producer task is cancelled, which closes the Ollama stream so the
+    model stops generating. Everything runs on the event loop, so no locks.
+    """
+
+    def __init__(self, max_concurrent=None):
+        self.max_concurrent = max_concurrent or int(os.environ.get("MARIE_LLM_CONCURRENCY", DEFAULT_MAX_CONCURRENT))
+        self.queues = {}          # user_id -> deque of waiting Tickets
+        self.order = deque()      # users with waiting tickets, next to be served first
+        self.running = {}         # user_id -> [running Tickets]
+        self.active = 0
+        self.waits = deque(maxlen=WAIT_SAMPLES)
+        self.counts = {"submitted": 0, "completed": 0, "superseded": 0, "disconnected": 0}
+
+    def submit(self, user_id, trace_id=None, supersede=True):
+        """Queues a request. With supersede, the user's older requests are cancelled."""
+        ticket = Ticket(user_id, trace_id)
+        self.counts["submitted"] += 1
+        if supersede:
+            for old in self.queues.pop(user_id, ()):
+                self._supersede(old)
+                # Skip tickets whose client already left (their future is cancelled)
+                if not old.granted.done():
+                    old.granted.set_result(False)
+            if user_id in self.order:
+                self.order.remove(user_id)
+            for old in self.running.get(user_id, ()):
+                self._supersede(old)
+                if old.task:
+                    old.task.cancel()
+
+        if user_id not in self.queues:
+            self.queues[user_id] = deque()
+            self.order.append(user_id)
+        self.queues[user_id].append(ticket)
+        self._dispatch()
+        return ticket
+
+    async def run(self, ticket, make_stream):
+        """Waits for a slot, then yields tokens from make_stream().
+
+        Ends early (without error) if the ticket is superseded; check
+        ticket.superseded afterwards.
+        """
+        try:
+            granted = await ticket.granted
+        except asyncio.CancelledError:
+            # Client went away. Cancelling the await also cancels the future,
+            # so a ticket holding a slot is one that was granted just before.
+            granted = ticket.granted
+            if granted.done() and not granted.cancelled() and granted.result():
+                self._release(ticket)
+            else:
+                self._drop(ticket)
+                if not ticket.superseded:
+                    self.counts["disconnected"] += 1
+            raise
+        if not granted:
+            return
+        if ticket.superseded:
+            # Superseded between being granted and getting here
+            self._release(ticket)
+            return
+
+        # Generation runs in its own task so superseding can cancel it
+        # mid-prefill; the response side just sees the stream end.
+        tokens = asyncio.Queue()
+
+        async def produce():
+            try:
+                async for token in make_stream():
+                    tokens.put_nowait(token)
+            except asyncio.CancelledError:
+                pass
+            except Exception as e:
+                print(f"[SCHEDULER] Generation failed: {e}")
+            finally:
+                tokens.put_nowait(_DONE)
+
+        ticket.task = asyncio.create_task(produce())
+        finished = False
+        try:
+            while True:
+                token = await tokens.get()
+                if token is _DONE:
+                    finished = True
+                    break
+                yield token
+        finally:
+            # Also reached when the client disconnects: stop generating for nobody
+            if not ticket.task.done():
+                ticket.task.cancel()
+            self._release(ticket, finished)
+
+    def snapshot(self):
+        """Queue depth, running generations and recent wait times."""
+        waits = sorted(self.waits)
+        return {
+            "max_concurrent": self.max_concurrent,
+            "active": self.active,
+            "queued": sum(len(q) for q in self.queues.values()),
+            "queued_by_user": {str(user): len(q) for user, q in self.queues.items()},
+            "oldest_wait_ms": round(max((q[0].wait for q in self.queues.values()), default=0) * 1000, 1),
+            "wait_ms_p50": round(waits[len(waits) // 2] * 1000, 1) if waits else None,
+            "wait_ms_p95": round(waits[int(len(waits) * 0.95)] * 1000, 1) if waits else None,
+            **self.counts,
+        }
+
+    def _dispatch(self):
+        while self.active < self.max_concurrent and self.order:
+            user_id = self.order.popleft()
+            queue = self.queues[user_id]
+            ticket = queue.popleft()
+            if queue:
+                self.order.append(user_id)     # back of the line for their next request
+            else:
+                del self.queues[user_id]
+            if ticket.granted.done():
+                continue                       # abandoned while queued, never takes a slot
+            ticket.started_at = time.time()
+            self.waits.append(ticket.wait)
+            self.active += 1
+            self.running.setdefault(user_id, []).append(ticket)
+            ticket.granted.set_result(True)
+
+    def _release(self, ticket, finished=False):
+        """Frees a running ticket's slot. finished: its stream ran to the end."""
+        running = self.running.get(ticket.user_id, [])
+        if ticket not in running:
+            return
+        running.remove(ticket)
+        if not running:
+            del self.running[ticket.user_id]
+        self.active -= 1
+        if not ticket.superseded:
+            self.counts["completed" if finished else "disconnected"] += 1
+        self._dispatch()
+
+    def _drop(self, ticket):
+        queue = self.queues.get(ticket.user_id)
+        if queue and ticket in queue:
+            queue.remove(ticket)
+            if not queue:
+                del self.queues[ticket.user_id]
+                self.order.remove(ticket.user_id)
+
+    def _supersede(self, ticket):
+        if ticket.superseded:
+            return
+        ticket.superseded = True
+        self.counts["superseded"] += 1
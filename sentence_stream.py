@@ -0,0 +1,69 @@
+import re
+
+# Emotion tags look like [happy]; MarieVoice._get_physics reads the same format
+TAG_PATTERN = re.compile(r"\[([a-zA-Z]+)\]")
+
+# End of sentence: . ! ? (or an ellipsis) plus optional closing quotes/brackets, then whitespace
+BOUNDARY_PATTERN = re.compile(r"[.!?…]+[\"')\]]*\s+|\n+")
+
+# Dots that do not end a sentence
+ABBREVIATIONS = {"mr.", "mrs.", "ms.", "dr.", "prof.", "st.", "vs.", "etc.", "e.g.", "i.e."}
+
+
+class SentenceSplitter:
+    """Turns a stream of LLM tokens into complete sentences for TTS.
+
+    Feed tokens as they arrive; every finished sentence is returned as soon
+    as its boundary is seen. The last emotion tag carries over to following
+    sentences that have none, so the voice keeps the same speed/mood.
+    """
+
+    def __init__(self, min_chars=2):
+        self.buffer = ""
+        self.emotion = None
+        self.min_chars = min_chars
+
+    def feed(self, token):
+        """Adds a token and returns the list of sentences it completed."""
+        self.buffer += token
+        sentences = []
+        start = 0
+
+        for match in BOUNDARY_PATTERN.finditer(self.buffer):
+            end = match.end()
+            candidate = self.buffer[start:end]
+
+            # Never cut inside an unfinished [tag]
+            if candidate.count("[") > candidate.count("]"):
+                continue
+            last_word = candidate.strip().split(" ")[-1].lower()
+            if last_word in ABBREVIATIONS:
+                continue
+
+            sentence = self._finish(candidate)
+            if sentence:
+                sentences.append(sentence)
+            start = end
+
+        self.buffer = self.buffer[start:]
+        return sentences
+
+    def flush(self):
+        """Returns whatever is left once the stream has ended."""
+        sentence = self._finish(self.buffer)
+        self.buffer = ""
+        return [sentence] if sentence else []
+
+    def _finish(self, text):
+        text = text.strip()
+        tags = TAG_PATTERN.findall(text)
+        if tags:
+            self.emotion = tags[-1].lower()
+
+        # A lone tag has nothing to say, it only sets the mood for what follows
+        if len(TAG_PATTERN.sub("", text).strip()) < self.min_chars:
+            return None
+
+        if not tags and self.emotion:
+            text = f"[{self.emotion}] {text}"
+        return text
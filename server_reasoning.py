@@ -1,25 +1,179 @@
+import os
+import time
+import uuid
+import asyncio
+import threading
 from fastapi import FastAPI, Body
+from fastapi.responses import StreamingResponse, PlainTextResponse
 import uvicorn
-from index import get_marie_response_stream #
+from index import get_marie_response_stream_async, summarize_conversation #
 from database import MarieDB #
+from conversation import ConversationManager, INTERRUPTED_MARKER
+from sentence_stream import TAG_PATTERN
+from tracing import get_tracer, new_trace_id
+from scheduler import LLMScheduler
 
 app = FastAPI()
 db = MarieDB()
+# Per-user recent turns + rolling summary, bounded by MARIE_HISTORY_TOKENS
+conversations = ConversationManager(db, summarize_conversation)
+tracer = get_tracer("brain")
+STARTED_AT = time.time()
+
+# Ollama generations are scheduled (per-user fair, newer messages supersede
+# older ones, at most MARIE_LLM_CONCURRENCY at once). Blocking SQLite calls
+# run on worker threads, at most MARIE_DB_CONCURRENCY at once; requests over
+# either limit wait on the event loop without holding a thread.
+scheduler = LLMScheduler()
+db_slots = asyncio.Semaphore(int(os.environ.get("MARIE_DB_CONCURRENCY", "4")))
+
+# Running totals of Ollama's own counters. prompt_eval_count only counts
+# tokens Ollama actually had to prefill, so comparing it with the prompt
+# size shows how much of each prompt came from the KV cache.
+llm_totals = {"requests": 0, "prompt_tokens_estimated": 0, "prompt_eval_count": 0,
+              "prompt_eval_ms": 0.0, "eval_count": 0, "eval_ms": 0.0, "load_ms": 0.0}
+llm_totals_lock = threading.Lock()
+
+def record_llm_stats(stats, start, trace_id):
+    prefill = stats.get("prompt_eval_duration", 0) / 1e9
+    generate = stats.get("eval_duration", 0) / 1e9
+    tracer.record("llm_prefill", start, start + prefill, trace_id, tokens=stats.get("prompt_eval_count", 0))
+    tracer.record("llm_eval", start + prefill, start + prefill + generate, trace_id,
+                  tokens=stats.get("eval_count", 0))
+    with llm_totals_lock:
+        llm_totals["requests"] += 1
+        llm_totals["prompt_tokens_estimated"] += stats.get("prompt_chars", 0) // 4
+        llm_totals["prompt_eval_count"] += stats.get("prompt_eval_count", 0)
+        llm_totals["prompt_eval_ms"] += prefill * 1000
+        llm_totals["eval_count"] += stats.get("eval_count", 0)
+        llm_totals["eval_ms"] += generate * 1000
+        llm_totals["load_ms"] += stats.get("load_duration", 0) / 1e6
+
+def reply_emotion(reply):
+    """The emotion a reply opens with ("[happy] Hi!" -> "happy"), for chat_logs.emotion_tag."""
+    match = TAG_PATTERN.search(reply)
+    return match.group(1).lower() if match else "neutral"
+
+async def run_db(name, trace_id, fn, *args):
+    """Runs a blocking MarieDB/ConversationManager call on a worker thread, a few at a time."""
+    start = time.time()
+    async with db_slots:
+        result = await asyncio.to_thread(fn, *args)
+    tracer.record(name, start, time.time(), trace_id)
+    return result
+
+async def stream_reply(user_text, user_id, rag_context, history=None, trace_id=None, turn_id=None,
+                       idempotency_key=None, supersede=True):
+    """Yields tokens as Ollama produces them, then logs the turn.
+
+    The user message and the reply are written as one pair, keyed by the
+    turn's idempotency key so a resent turn is not stored twice. A reply
+    that does not finish (superseded by the user's next message, or the
+    client went away) is logged as far as it got, marked as interrupted;
+    the user message is logged either way.
+    """
+    full_response = ""
+    finished = False
+    # Coroutines share the event loop thread, so spans are timed by hand
+    # instead of with tracer.span() (its parent stack is per thread)
+    ticket = scheduler.submit(user_id, trace_id, supersede)
+    tokens = 0
+    stats = {}
+    first_token = None
+    start = None
+    generate = lambda: get_marie_response_stream_async(user_text, memory_context=rag_context,
+                                                       history=history, stats=stats)
+    try:
+        async for token in scheduler.run(ticket, generate):
+            if start is None:
+                start = ticket.started_at
+                tracer.record("llm_queue_wait", ticket.enqueued_at, start, trace_id)
+            if first_token is None and token:
+                first_token = time.time()
+                tracer.record("llm_first_token", start, first_token, trace_id)
+            tokens += 1
+            full_response += token
+            yield token
+        finished = not ticket.superseded
+    finally:
+        # Also runs when a disconnect cancels or closes this generator, which
+        # is how the GUI drops a turn it has moved on from. Only queues the
+        # rows; the group-commit writer thread does the insert.
+        if finished:
+            reply = full_response
+        elif full_response.strip():
+            # Logged for the record, but kept out of the LLM history and summary
+            reply = f"{full_response.rstrip()} {INTERRUPTED_MARKER}"
+        else:
+            reply = None
+        db.log_turn(user_id, user_text, reply, reply_emotion(full_response),
+                    turn_id=turn_id, idempotency_key=idempotency_key)
+
+    if not finished:
+        tracer.record("llm_superseded", ticket.enqueued_at, time.time(), trace_id, tokens=tokens)
+        return
+    tracer.record("llm_stream", start or ticket.enqueued_at, time.time(), trace_id, tokens=tokens)
+    if stats.get("total_duration"):
+        record_llm_stats(stats, start, trace_id)
+
+    await run_db("history_update", trace_id, conversations.add_turn, user_id, user_text, full_response)
+
+# Everything below runs on the event loop and must not block it: Ollama is
+# streamed with the async client, SQLite goes through run_db.
+@app.get("/health")
+async def health():
+    """Cheap liveness check; the launcher and the GUI poll this at startup."""
+    return {"status": "ok", "uptime": round(time.time() - STARTED_AT, 1)}
+
+@app.get("/metrics")
+async def metrics():
+    queue = scheduler.snapshot()
+    gauges = "".join(f"# TYPE marie_llm_{name} gauge\nmarie_llm_{name} {queue[name]}\n"
+                     for name in ("queued", "active", "oldest_wait_ms"))
+    return PlainTextResponse(tracer.prometheus_text() + gauges, media_type="text/plain; version=0.0.4")
+
+@app.get("/llm/queue")
+async def llm_queue():
+    """Scheduler state: queue depth per user, running generations, recent wait times."""
+    return scheduler.snapshot()
+
+@app.get("/llm/stats")
+async def llm_stats():
+    with llm_totals_lock:
+        totals = {k: round(v, 1) if isinstance(v, float) else v for k, v in llm_totals.items()}
+    estimated = totals["prompt_tokens_estimated"]
+    # Share of prompt tokens that did not need a prefill (approximate)
+    totals["prefix_reuse"] = round(max(0.0, 1 - totals["prompt_eval_count"] / estimated), 3) if estimated else None
+    return totals
 
 @app.post("/chat")
-def chat_endpoint(payload: dict = Body(...)):
+async def chat_endpoint(payload: dict = Body(...)):
     user_text = payload.get("text")
-    rag_context = db.get_all_rad_data() 
-    
+    user_id = payload.get("user_id")
+    trace_id = payload.get("trace_id") or new_trace_id()
+    # Clients send their own turn id so a resent message keeps the same key
+    turn_id = payload.get("turn_id") or uuid.uuid4().hex
+    idempotency_key = payload.get("idempotency_key") or f"{user_id}:{turn_id}"
+    # A new message cancels the user's unfinished one unless the client opts out
+    supersede = payload.get("supersede", True)
+    # The brain server is the only writer of chat_logs (see stream_reply)
+    # Only the facts relevant to this message, not the whole memory table
+    rag_context, history = await asyncio.gather(
+        run_db("rad_search", trace_id, db.search_rad_data, user_text),
+        run_db("history", trace_id, conversations.messages, user_id))
 
-    full_response = ""
-    for token in get_marie_response_stream(user_text, memory_context=rag_context):
-        full_response += token
-        
-        
-    db.log_chat(payload.get("user_id"), "marie", full_response) 
+    # Streaming mode: chunked plain-text body, one chunk per token
+    if payload.get("stream"):
+        return StreamingResponse(stream_reply(user_text, user_id, rag_context, history, trace_id,
+                                              turn_id, idempotency_key, supersede),
+                                 media_type="text/plain; charset=utf-8",
+                                 headers={"X-Trace-Id": trace_id, "X-Turn-Id": turn_id})
+
+    full_response = "".join([token async for token in stream_reply(user_text, user_id, rag_context, history,
+                                                                   trace_id, turn_id, idempotency_key,
+                                                                   supersede)])
     
-    return {"response": full_response}
+    return {"response": full_response, "turn_id": turn_id}
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="127.0.0.1", port=8000)
\ No newline at end of file
+    uvicorn.run(app, host="127.0.0.1", port=8000)
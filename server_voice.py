@@ -1,8 +1,16 @@
 import os
+import time
+import tempfile
+import threading
 import uvicorn
-from fastapi import FastAPI, Body
+from fastapi import FastAPI, Body, HTTPException
+from fastapi.responses import PlainTextResponse
 from voice import MarieVoice
 from voice_db import get_character_data, RVC_DIR
+from rvc_cache import RVCModelCache
+from database import MarieDB
+from audio_utils import array_to_wav, wav_to_array
+from tracing import get_tracer
 
 
 try:
@@ -13,65 +21,151 @@ except ImportError:
     RVC_AVAILABLE = False
 
 app = FastAPI()
+tracer = get_tracer("voice")
 voice_engine = MarieVoice()
-rvc_engine = None
+STARTED_AT = time.time()
+prewarmed = False
+rvc_cache = None
 
 if RVC_AVAILABLE:
     # NOTE: CPU conversion takes 5-10 seconds! GPU takes 0.5s.
     device = "cuda:0" if os.environ.get("CUDA_VISIBLE_DEVICES") else "cpu"
-    rvc_engine = RVCInference(device=device)
+    # Loaded models stay resident (LRU, budget from MARIE_RVC_CACHE_MB)
+    rvc_cache = RVCModelCache(lambda dev: RVCInference(device=dev))
+
+def rvc_paths(char_data):
+    model_path = os.path.join(RVC_DIR, char_data["rvc_model"])
+    index_name = char_data.get("rvc_index", "")
+    index_path = os.path.join(RVC_DIR, index_name) if index_name else None
+    return model_path, index_path
+
+def convert_rvc(samples, rate, char_data):
+    """Runs RVC on Piper audio. Returns (samples, rate), or None on failure."""
+    if not (char_data.get("rvc_enable", False) and RVC_AVAILABLE):
+        return None
+
+    model_name = char_data["rvc_model"]
+    pitch = char_data.get("pitch_shift", 0)
+    model_path, index_path = rvc_paths(char_data)
+    
+    print(f"[RVC] Converting using {model_name}...")
+    
+    print(f"[RVC] Converting on GTX 1080 (Legacy Mode)...")
+    
+    try:
+        # Only loads the .pth on a cache miss
+        entry = rvc_cache.get(model_path, index_path, device)
+
+        # rvc-python only exposes a file-based API, so the hand-off goes through a
+        # private temp dir per call (no shared file names between requests).
+        with tempfile.TemporaryDirectory(prefix="marie_rvc_") as tmp:
+            input_path = os.path.join(tmp, "in.wav")
+            output_path = os.path.join(tmp, "out.wav")
+            with open(input_path, "wb") as f:
+                f.write(array_to_wav(samples, rate))
+
+            with entry.lock, tracer.span("rvc_infer_file", model=model_name):
+                entry.engine.infer_file(
+                    input_path=input_path,
+                    output_path=output_path,
+                    index_path=index_path,
+                    f0_up_key=pitch, 
+                    # Legacy mode for GTX 1080
+                    f0_method="rmvpe", 
+                    version="v2",
+                    is_half=True
+                )
+
+            with open(output_path, "rb") as f:
+                return wav_to_array(f.read())
+    except Exception as e:
+        print(f"[RVC ERROR] {e}")
+        return None
+
+# Every render goes through RVC when it is installed (cache hits skip it)
+voice_engine.converter = convert_rvc if RVC_AVAILABLE else None
+
+def prewarm_persona():
+    """Loads the last active user's persona so their first reply is not a cold start."""
+    global prewarmed
+    try:
+        char_id = MarieDB().get_last_active_voice()
+    except Exception as e:
+        print(f"[PREWARM] Could not read preferences: {e}")
+        char_id = None
+
+    if char_id:
+        char_data, _ = get_character_data(char_id)
+        print(f"[PREWARM] Loading persona: {char_data['name']}")
+        if rvc_cache and char_data.get("rvc_enable", False):
+            rvc_cache.prewarm(*rvc_paths(char_data), device)
+    prewarmed = True
+
+@app.on_event("startup")
+def start_prewarm():
+    threading.Thread(target=prewarm_persona, daemon=True).start()
+
+@app.get("/health")
+def health():
+    """Cheap liveness check; the launcher and the GUI poll this at startup."""
+    return {
+        "status": "ok",
+        "uptime": round(time.time() - STARTED_AT, 1),
+        "voice": voice_engine.current_name,
+        "rvc": RVC_AVAILABLE,
+        "prewarmed": prewarmed,
+    }
+
+@app.get("/metrics")
+def metrics():
+    return PlainTextResponse(tracer.prometheus_text(), media_type="text/plain; version=0.0.4")
+
+@app.get("/audio/stats")
+def audio_stats():
+    return voice_engine.audio_cache.stats()
+
+@app.get("/rvc/stats")
+def rvc_stats():
+    if not rvc_cache:
+        return {"enabled": False}
+    return {"enabled": True, **rvc_cache.stats()}
 
 @app.post("/speak")
 def speak_endpoint(payload: dict = Body(...)):
+    """Queues an utterance and returns its job id without waiting for audio."""
     text = payload.get("text")
     char_id = payload.get("character", "tachyon").lower()
     
 
     char_data, _ = get_character_data(char_id)
-    use_rvc = char_data.get("rvc_enable", False) and RVC_AVAILABLE
+
+    # Barge-in: drop whatever is still queued or playing before this one
+    if payload.get("interrupt"):
+        voice_engine.stop()
     
+    # Voices stay pooled in the Piper engine, so a persona switch only loads once
     if voice_engine.current_name.lower() != char_data["name"].lower():
         voice_engine.set_voice(char_id)
 
+    # Synthesis (Piper + RVC, or a cache hit) and playback run on MarieVoice's
+    # own threads, so this HTTP worker is free again immediately.
+    job_id = voice_engine.speak(text, trace_id=payload.get("trace_id"))
+    if not job_id:
+        return {"status": "empty"}
+    return {"status": "queued", "job_id": job_id}
+
+@app.get("/speak/{job_id}")
+def speak_status(job_id: str):
+    job = voice_engine.job_status(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    return job
 
-    raw_audio_path = voice_engine.generate_only(text)
-
-    final_path = raw_audio_path
-
-    if use_rvc and raw_audio_path:
-        model_name = char_data["rvc_model"]
-        index_name = char_data.get("rvc_index", "")
-        pitch = char_data.get("pitch_shift", 0)
-
-        model_path = os.path.join(RVC_DIR, model_name)
-        index_path = os.path.join(RVC_DIR, index_name) if index_name else None
-        
-        output_rvc_path = raw_audio_path.replace(".wav", "_rvc.wav")
-        
-        print(f"[RVC] Converting using {model_name}...")
-        
-        print(f"[RVC] Converting on GTX 1080 (Legacy Mode)...")
-        
-        try:
-            rvc_engine.load_model(model_path)
-            rvc_engine.infer_file(
-                input_path=raw_audio_path,
-                output_path=output_rvc_path,
-                index_path=index_path,
-                f0_up_key=pitch, 
-                # Legacy mode for GTX 1080
-                f0_method="rmvpe", 
-                version="v2",
-                is_half=True
-            )
-            final_path = output_rvc_path
-        except Exception as e:
-            print(f"[RVC ERROR] {e}")
-            final_path = raw_audio_path
-
-    voice_engine.play_file(final_path)
-
-    return {"status": "speaking", "file": final_path}
+@app.post("/stop")
+def stop_endpoint():
+    """Stops playback and cancels queued speech (used when the user starts talking)."""
+    voice_engine.stop()
+    return {"status": "stopped"}
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="127.0.0.1", port=8001)
\ No newline at end of file
+    uvicorn.run(app, host="127.0.0.1", port=8001)
@@ -0,0 +1,72 @@
+import time
+import threading
+import requests
+from contextlib import contextmanager
+
+HEALTH_POLL_INTERVAL = 0.5
+
+
+class StartupReport:
+    """Per-stage startup timings, relative to when the process started.
+
+    Stages may overlap (they run in parallel), so each line shows when the
+    stage began as well as how long it took. The report is printed once every
+    expected stage has finished.
+    """
+
+    def __init__(self, expected=(), t0=None):
+        self.t0 = t0 or time.perf_counter()
+        self.expected = list(expected)
+        self.stages = {}      # name -> [start, end, ok]
+        self.lock = threading.Lock()
+        self.printed = False
+
+    def begin(self, name):
+        with self.lock:
+            self.stages[name] = [time.perf_counter() - self.t0, None, None]
+
+    def end(self, name, ok=True):
+        with self.lock:
+            stage = self.stages.setdefault(name, [0.0, None, None])
+            stage[1] = time.perf_counter() - self.t0
+            stage[2] = ok
+            done = all(self.stages.get(n, [None, None])[1] is not None for n in self.expected)
+            if not done or self.printed:
+                return
+            self.printed = True
+        print(self.summary())
+
+    @contextmanager
+    def stage(self, name):
+        self.begin(name)
+        ok = False
+        try:
+            yield
+            ok = True
+        finally:
+            self.end(name, ok)
+
+    def summary(self):
+        with self.lock:
+            rows = sorted(self.stages.items(), key=lambda item: item[1][0])
+        lines = ["[STARTUP] Stage              start    took   ok"]
+        for name, (start, end, ok) in rows:
+            took = f"{end - start:6.2f}s" if end is not None else "   ...."
+            status = "-" if ok is None else ("yes" if ok else "NO")
+            lines.append(f"[STARTUP] {name:<18} {start:6.2f}s {took}  {status}")
+        total = max((s[1] or s[0]) for _, s in rows) if rows else 0.0
+        lines.append(f"[STARTUP] Ready after {total:.2f}s")
+        return "\n".join(lines)
+
+
+def wait_for_health(url, timeout=60.0):
+    """Polls a server's /health until it answers. Returns True if it came up in time."""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if requests.get(url, timeout=1).ok:
+                return True
+        except requests.RequestException:
+            pass
+        time.sleep(HEALTH_POLL_INTERVAL)
+    return False
@@ -0,0 +1,211 @@
+import time
+import queue
+import threading
+import numpy as np
+
+SAMPLE_RATE = 16000
+FRAME_MS = 30
+FRAME_SAMPLES = SAMPLE_RATE * FRAME_MS // 1000
+
+# Accuracy vs. latency trade-offs. partial_interval is seconds of new audio
+# between partial decodes; partial_window is how many seconds of the end of
+# the phrase a partial decodes (the final decode always gets all of it);
+# beams are Whisper beam sizes.
+LATENCY_PROFILES = {
+    "fast":     {"partial_beam": 1, "final_beam": 1, "partial_interval": 1.0, "partial_window": 4.0},
+    "balanced": {"partial_beam": 1, "final_beam": 3, "partial_interval": 0.7, "partial_window": 6.0},
+    "accurate": {"partial_beam": 2, "final_beam": 5, "partial_interval": 0.5, "partial_window": 8.0},
+}
+
+# Partials may use at most this share of real time: after a partial that took
+# 0.4 s, the next one waits for at least 0.8 s of new audio
+PARTIAL_LOAD = 0.5
+
+
+def frame_to_float(frame):
+    """16-bit PCM bytes -> float32 in [-1, 1], the format Whisper takes."""
+    return np.frombuffer(frame, dtype=np.int16).astype(np.float32) / 32768.0
+
+
+class EnergyVAD:
+    """Frame-level voice activity detector based on RMS energy.
+
+    The first frames calibrate the noise floor (like adjust_for_ambient_noise);
+    afterwards the floor keeps adapting on frames that are not speech.
+    """
+
+    def __init__(self, ratio=3.0, min_energy=0.004, calibration_frames=16):
+        self.ratio = ratio
+        self.min_energy = min_energy
+        self.calibration_frames = calibration_frames
+        self.reset()
+
+    def reset(self):
+        self.noise = None
+        self.seen = 0
+
+    def threshold(self):
+        return max(self.min_energy, (self.noise or 0.0) * self.ratio)
+
+    def is_speech(self, samples):
+        rms = float(np.sqrt(np.mean(samples ** 2))) if len(samples) else 0.0
+
+        if self.seen < self.calibration_frames:
+            self.seen += 1
+            self.noise = rms if self.noise is None else 0.8 * self.noise + 0.2 * rms
+            return False
+
+        speech = rms > self.threshold()
+        if not speech:
+            self.noise = 0.95 * self.noise + 0.05 * rms
+        return speech
+
+
+class StreamingTranscriber:
+    """Decodes speech while the user is still talking.
+
+    feed() takes one mic frame at a time and returns a list of events:
+      ("start", None)    speech onset (used for barge-in)
+      ("partial", text)  running hypothesis, refreshed every partial_interval
+      ("final", text)    phrase finished (pause_threshold of silence or max_phrase)
+    """
+
+    def __init__(self, model, profile="balanced", pause_threshold=0.8, max_phrase=10.0,
+                 onset_frames=3, preroll=0.3):
+        self.model = model
+        self.profile = LATENCY_PROFILES.get(profile, LATENCY_PROFILES["balanced"])
+        self.pause_frames = int(pause_threshold * 1000 / FRAME_MS)
+        self.max_samples = int(max_phrase * SAMPLE_RATE)
+        self.onset_frames = onset_frames
+        self.preroll_frames = int(preroll * 1000 / FRAME_MS)
+        self.partials = True
+        # Optional gate(samples) -> bool checked before the final decode
+        # (the wake-word detector); a rejected phrase never reaches Whisper.
+        self.gate = None
+        self.last_phrase = None
+        self.vad = EnergyVAD()
+        self.reset()
+
+    def reset(self):
+        """Drops any phrase in progress (and recalibrates the noise floor)."""
+        self.vad.reset()
+        self._clear_phrase()
+
+    def _clear_phrase(self):
+        self.recent = []          # frames before onset, kept as pre-roll
+        self.frames = []
+        self.in_speech = False
+        self.voiced_run = 0
+        self.silence_run = 0
+        self.decoded_samples = 0
+        self.partial_cost = 0.0
+        self.language = None
+
+    def feed(self, frame, prompt=None):
+        samples = frame_to_float(frame)
+        speech = self.vad.is_speech(samples)
+        events = []
+
+        if not self.in_speech:
+            self.recent.append(samples)
+            self.recent = self.recent[-(self.preroll_frames + self.onset_frames):]
+            self.voiced_run = self.voiced_run + 1 if speech else 0
+            if self.voiced_run >= self.onset_frames:
+                self.in_speech = True
+                self.frames = self.recent
+                self.recent = []
+                events.append(("start", None))
+            return events
+
+        self.frames.append(samples)
+        self.silence_run = 0 if speech else self.silence_run + 1
+        total = len(self.frames) * FRAME_SAMPLES
+
+        if self.silence_run >= self.pause_frames or total >= self.max_samples:
+            self.last_phrase = np.concatenate(self.frames)
+            if self.gate and not self.gate(self.last_phrase):
+                self._clear_phrase()
+                return events
+            text = self._decode(self.profile["final_beam"], prompt)
+            self._clear_phrase()
+            if text:
+                events.append(("final", text))
+            return events
+
+        # Partials decode a sliding window of the latest audio, and back off
+        # when decoding is slow, so their cost stays flat however long the
+        # phrase gets and they never fall behind the microphone
+        new_audio = (total - self.decoded_samples) / SAMPLE_RATE
+        interval = max(self.profile["partial_interval"], self.partial_cost / PARTIAL_LOAD)
+        if self.partials and new_audio >= interval:
+            self.decoded_samples = total
+            window = int(self.profile["partial_window"] * SAMPLE_RATE)
+            start = time.perf_counter()
+            text = self._decode(self.profile["partial_beam"], prompt, window)
+            self.partial_cost = time.perf_counter() - start
+            if text and total > window:
+                text = "..." + text
+            if text:
+                events.append(("partial", text))
+        return events
+
+    def _decode(self, beam_size, prompt, window=None):
+        audio = np.concatenate(self.frames)
+        if window and len(audio) > window:
+            audio = audio[-window:]
+        segments, info = self.model.transcribe(
+            audio,
+            beam_size=beam_size,
+            initial_prompt=prompt,
+            # Language is detected once per phrase, then reused for later passes
+            language=self.language,
+            condition_on_previous_text=False,
+            without_timestamps=True
+        )
+        text = "".join(s.text for s in segments).strip()
+        self.language = self.language or getattr(info, "language", None)
+        return text
+
+
+class MicCapture:
+    """Reads fixed-size frames from a speech_recognition Microphone on its own thread.
+
+    Decoding happens on the consumer side, so a slow decode never makes the
+    audio device overflow; frames just wait in the queue.
+    """
+
+    def __init__(self, mic):
+        self.mic = mic
+        self.frames = queue.Queue()
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        if self.running: return
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout=1)
+            self.thread = None
+        while True:
+            try: self.frames.get_nowait()
+            except queue.Empty: break
+
+    def read(self, timeout=0.5):
+        try:
+            return self.frames.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def _run(self):
+        try:
+            with self.mic as source:
+                while self.running:
+                    self.frames.put(source.stream.read(source.CHUNK))
+        except Exception as e:
+            print(f"[Voice Error] Microphone: {e}")
+            self.running = False
@@ -0,0 +1,116 @@
+import os
+import sys
+import random
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app_catalog import AppCatalog
+
+# (name, exec) pairs that queries below must resolve to
+KNOWN_APPS = [
+    ("Steam", "steam %U"),
+    ("OBS Studio", "obs"),
+    ("Visual Studio Code", "code --new-window %F"),
+    ("Firefox Web Browser", "firefox %u"),
+    ("Discord", "discord"),
+    ("Minecraft Launcher", "minecraft-launcher"),
+    ("Spotify", "spotify %U"),
+    ("GNU Image Manipulation Program", "gimp-2.10 %U"),
+]
+
+# query -> expected app name
+QUERIES = {
+    "steam": "Steam",
+    "obs studio": "OBS Studio",
+    "obs": "OBS Studio",
+    "discrod": "Discord",
+    "spotfy": "Spotify",
+    "firefox": "Firefox Web Browser",
+    "visual studio code": "Visual Studio Code",
+    "minecraft": "Minecraft Launcher",
+    "gimp": "GNU Image Manipulation Program",
+    "code": "Visual Studio Code",
+}
+
+SYLLABLES = "ka lo mi ne ra to vu ze pi sa de fo gu hi ju".split()
+
+
+def write_desktop(path, name, command, keywords=""):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("[Desktop Entry]\nType=Application\n")
+        f.write(f"Name={name}\nExec={command}\n")
+        if keywords:
+            f.write(f"Keywords={keywords}\n")
+
+
+def build_fixture(folder, count, seed=0):
+    """Writes the KNOWN_APPS, a hidden entry and random filler apps as .desktop files.
+
+    Returns the paths of the visible entries, KNOWN_APPS first.
+    """
+    rng = random.Random(seed)
+    paths = []
+    for name, command in KNOWN_APPS:
+        path = os.path.join(folder, command.split()[0] + ".desktop")
+        write_desktop(path, name, command)
+        paths.append(path)
+    # Hidden entries must never be returned
+    with open(os.path.join(folder, "hidden.desktop"), "w", encoding="utf-8") as f:
+        f.write("[Desktop Entry]\nType=Application\nName=Secret Tool\nExec=secret\nNoDisplay=true\n")
+    for i in range(count - len(KNOWN_APPS)):
+        words = ["".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))).capitalize()
+                 for _ in range(rng.randint(1, 3))]
+        path = os.path.join(folder, f"app{i:05d}.desktop")
+        write_desktop(path, " ".join(words), f"app{i:05d} %F", ";".join(w.lower() for w in words))
+        paths.append(path)
+    return paths
+
+
+class AppCatalogTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.folder = os.path.join(self.tmp.name, "applications")
+        os.makedirs(self.folder)
+        self.paths = build_fixture(self.folder, 200)
+        self.index_path = os.path.join(self.tmp.name, "app_catalog.json")
+        self.catalog = AppCatalog([self.folder], self.index_path)
+        self.assertEqual(self.catalog.rescan(), (len(self.paths) + 1, 0))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def assertFinds(self, catalog, query, expected):
+        entry = catalog.lookup(query)
+        self.assertEqual(entry.name if entry else None, expected, query)
+
+    def test_queries_resolve_from_saved_index(self):
+        # A fresh instance only loads the saved index
+        reloaded = AppCatalog([self.folder], self.index_path)
+        self.assertEqual(len(reloaded), len(self.catalog))
+        for query, expected in QUERIES.items():
+            self.assertFinds(reloaded, query, expected)
+        self.assertIsNone(reloaded.lookup("zzqx"))
+
+    def test_hidden_entry_is_not_indexed(self):
+        self.assertIsNone(self.catalog.lookup("secret tool"))
+        self.assertIsNone(self.catalog.lookup("secret"))
+
+    def test_rescan_without_changes_does_nothing(self):
+        self.assertEqual(self.catalog.rescan(), (0, 0))
+
+    def test_incremental_rescan_picks_up_changed_and_removed_files(self):
+        write_desktop(self.paths[4], "Discord Canary", "discord-canary")
+        os.remove(self.paths[6])
+        self.assertEqual(self.catalog.rescan(), (1, 1))
+
+        for catalog in (self.catalog, AppCatalog([self.folder], self.index_path)):
+            self.assertFinds(catalog, "discord canary", "Discord Canary")
+            self.assertIsNone(catalog.lookup("spotify"))
+            self.assertFinds(catalog, "steam", "Steam")
+        self.assertEqual(self.catalog.rescan(), (0, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
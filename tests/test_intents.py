@@ -0,0 +1,45 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from intents import IntentRouter
+
+
+class IntentRouterTest(unittest.TestCase):
+    def setUp(self):
+        self.router = IntentRouter()
+
+    def assertRoutes(self, text, name, **slots):
+        intent = self.router.route(text)
+        self.assertIsNotNone(intent, text)
+        self.assertEqual((intent.name, intent.slots), (name, slots), text)
+
+    def test_commands(self):
+        self.assertRoutes("open steam", "open_app", app="steam")
+        self.assertRoutes("close discord", "close_app", app="discord")
+        self.assertRoutes("play lofi hip hop", "play_video", query="lofi hip hop")
+        self.assertRoutes("take a note: buy milk", "write_note", content="buy milk")
+        self.assertRoutes("turn up the volume", "volume_up")
+        self.assertRoutes("volume down", "volume_down")
+        self.assertRoutes("unmute", "mute")
+        self.assertRoutes("rescan apps", "scan_apps")
+
+    def test_politeness_prefix_and_suffix(self):
+        self.assertRoutes("hey marie, could you please open steam now?", "open_app", app="steam")
+        self.assertRoutes("Marie, can you close OBS Studio for me", "close_app", app="obs studio")
+        self.assertRoutes("please play never gonna give you up please.", "play_video",
+                          query="never gonna give you up")
+        self.assertRoutes("Okay marie mute the sound, thanks!", "mute")
+
+    def test_conversation_is_not_a_command(self):
+        for text in ["start over", "kill me now", "Quit it!", "run away please",
+                     "exit the conversation", "launch the rocket",
+                     "I always mute the tv during ads",
+                     "what should I play tonight?", "", None]:
+            self.assertIsNone(self.router.route(text), text)
+
+
+if __name__ == "__main__":
+    unittest.main()
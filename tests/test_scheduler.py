@@ -0,0 +1,97 @@
+import os
+import sys
+import asyncio
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scheduler import LLMScheduler
+
+
+def stream_until(event, tokens=("a", "b")):
+    async def stream():
+        for token in tokens:
+            await event.wait()
+            yield token
+    return stream
+
+
+async def consume(scheduler, ticket, make_stream):
+    return [token async for token in scheduler.run(ticket, make_stream)]
+
+
+class CancelWhileQueuedTest(unittest.IsolatedAsyncioTestCase):
+    async def test_cancelled_ticket_frees_queue_and_slot(self):
+        scheduler = LLMScheduler(max_concurrent=1)
+        release_a = asyncio.Event()
+
+        a = asyncio.create_task(consume(scheduler, scheduler.submit("A"), stream_until(release_a)))
+        await asyncio.sleep(0)
+        b = asyncio.create_task(consume(scheduler, scheduler.submit("B"), stream_until(asyncio.Event())))
+        await asyncio.sleep(0)
+        self.assertEqual(scheduler.snapshot()["queued"], 1)
+
+        b.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await b
+        self.assertEqual(scheduler.snapshot()["queued"], 0)
+
+        release_a.set()
+        self.assertEqual(await a, ["a", "b"])
+        self.assertEqual(scheduler.active, 0)
+
+        c = scheduler.submit("C")
+        self.assertEqual(await asyncio.wait_for(consume(scheduler, c, stream_until(release_a)), 1), ["a", "b"])
+        self.assertEqual(scheduler.active, 0)
+
+    async def test_supersede_skips_ticket_whose_client_left(self):
+        scheduler = LLMScheduler(max_concurrent=1)
+        release_a = asyncio.Event()
+        a = asyncio.create_task(consume(scheduler, scheduler.submit("A"), stream_until(release_a)))
+        await asyncio.sleep(0)
+
+        # Cancelled before run() ever awaited it: still sitting in the queue
+        stale = scheduler.submit("B")
+        stale.granted.cancel()
+        newer = scheduler.submit("B")
+
+        release_a.set()
+        await a
+        self.assertEqual(await asyncio.wait_for(consume(scheduler, newer, stream_until(release_a)), 1), ["a", "b"])
+        self.assertEqual(scheduler.active, 0)
+
+    async def test_dispatch_skips_abandoned_ticket(self):
+        scheduler = LLMScheduler(max_concurrent=1)
+        release_a = asyncio.Event()
+        a = asyncio.create_task(consume(scheduler, scheduler.submit("A"), stream_until(release_a)))
+        await asyncio.sleep(0)
+
+        abandoned = scheduler.submit("B", supersede=False)
+        abandoned.granted.cancel()
+        c = scheduler.submit("C")
+
+        release_a.set()
+        await a
+        self.assertEqual(await asyncio.wait_for(consume(scheduler, c, stream_until(release_a)), 1), ["a", "b"])
+        self.assertEqual(scheduler.active, 0)
+
+
+class DisconnectTest(unittest.IsolatedAsyncioTestCase):
+    async def test_closed_stream_is_not_counted_as_completed(self):
+        scheduler = LLMScheduler(max_concurrent=1)
+        release = asyncio.Event()
+        release.set()
+        stream = scheduler.run(scheduler.submit("A"), stream_until(release, ("a", "b", "c")))
+        self.assertEqual(await stream.__anext__(), "a")
+        await stream.aclose()
+
+        snapshot = scheduler.snapshot()
+        self.assertEqual((snapshot["completed"], snapshot["disconnected"]), (0, 1))
+        self.assertEqual(scheduler.active, 0)
+
+        self.assertEqual(await consume(scheduler, scheduler.submit("A"), stream_until(release)), ["a", "b"])
+        self.assertEqual(scheduler.snapshot()["completed"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
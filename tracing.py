@@ -0,0 +1,126 @@
+import os
+import json
+import time
+import uuid
+import queue
+import threading
+from contextlib import contextmanager
+
+# Spans are appended to traces/<service>.jsonl (set MARIE_TRACE_DIR to move it,
+# MARIE_TRACING=0 to stop writing files; /metrics keeps working either way).
+TRACE_DIR = os.environ.get("MARIE_TRACE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "traces"))
+TRACE_FILES = os.environ.get("MARIE_TRACING", "1") != "0"
+
+# Histogram buckets (seconds) for the Prometheus export
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def new_trace_id():
+    return uuid.uuid4().hex[:16]
+
+
+class Tracer:
+    """Records timed spans for one process (GUI, brain or voice server).
+
+    A trace id is created per user turn in the GUI and sent along with /chat
+    and /speak, so spans from all three processes can be joined on it. Spans
+    opened inside another span on the same thread inherit its trace id and
+    become its children. Finished spans go to a JSONL file on a background
+    thread and into per-name histograms for /metrics.
+    """
+
+    def __init__(self, service):
+        self.service = service
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.histograms = {}     # span name -> [bucket counts..., +Inf count, sum]
+        self.pending = queue.Queue()
+        self.writer = None
+
+    @contextmanager
+    def span(self, name, trace_id=None, **attrs):
+        stack = self.local.__dict__.setdefault("stack", [])
+        parent = stack[-1] if stack else (None, None)
+        trace_id = trace_id or parent[0]
+        span_id = uuid.uuid4().hex[:8]
+        stack.append((trace_id, span_id))
+        start = time.time()
+        t0 = time.perf_counter()
+        ok = False
+        try:
+            yield attrs
+            ok = True
+        finally:
+            stack.pop()
+            self._finish(name, trace_id, span_id, parent[1], start, time.perf_counter() - t0, ok, attrs)
+
+    def record(self, name, start, end, trace_id=None, **attrs):
+        """Adds a span measured elsewhere (start/end are time.time() values)."""
+        stack = getattr(self.local, "stack", None)
+        parent = stack[-1] if stack else (None, None)
+        self._finish(name, trace_id or parent[0], uuid.uuid4().hex[:8], parent[1],
+                     start, max(0.0, end - start), True, attrs)
+
+    def _finish(self, name, trace_id, span_id, parent_id, start, duration, ok, attrs):
+        with self.lock:
+            hist = self.histograms.setdefault(name, [0] * (len(BUCKETS) + 1) + [0.0])
+            for i, bound in enumerate(BUCKETS):
+                if duration <= bound:
+                    hist[i] += 1
+            hist[len(BUCKETS)] += 1
+            hist[-1] += duration
+
+        if not TRACE_FILES:
+            return
+        self.pending.put({
+            "trace_id": trace_id, "span_id": span_id, "parent_id": parent_id,
+            "service": self.service, "name": name, "start": round(start, 6),
+            "duration_ms": round(duration * 1000, 3), "ok": ok, **attrs,
+        })
+        if self.writer is None:
+            with self.lock:
+                if self.writer is None:
+                    self.writer = threading.Thread(target=self._write_loop, daemon=True)
+                    self.writer.start()
+
+    def _write_loop(self):
+        os.makedirs(TRACE_DIR, exist_ok=True)
+        path = os.path.join(TRACE_DIR, f"{self.service}.jsonl")
+        while True:
+            batch = [self.pending.get()]
+            while True:
+                try: batch.append(self.pending.get_nowait())
+                except queue.Empty: break
+            try:
+                with open(path, "a", encoding="utf-8") as f:
+                    f.writelines(json.dumps(span, default=str) + "\n" for span in batch)
+            except OSError as e:
+                print(f"[TRACE] Write failed: {e}")
+
+    def prometheus_text(self):
+        """Span histograms in the Prometheus text exposition format."""
+        lines = [
+            "# HELP marie_span_duration_seconds Duration of traced stages.",
+            "# TYPE marie_span_duration_seconds histogram",
+        ]
+        with self.lock:
+            items = sorted((name, list(hist)) for name, hist in self.histograms.items())
+        for name, hist in items:
+            labels = f'service="{self.service}",span="{name}"'
+            for bound, count in zip(BUCKETS, hist):
+                lines.append(f'marie_span_duration_seconds_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f'marie_span_duration_seconds_bucket{{{labels},le="+Inf"}} {hist[len(BUCKETS)]}')
+            lines.append(f"marie_span_duration_seconds_sum{{{labels}}} {hist[-1]:.6f}")
+            lines.append(f"marie_span_duration_seconds_count{{{labels}}} {hist[len(BUCKETS)]}")
+        return "\n".join(lines) + "\n"
+
+
+_tracers = {}
+_tracers_lock = threading.Lock()
+
+def get_tracer(service):
+    """Shared tracer per service name ("gui", "brain", "voice")."""
+    with _tracers_lock:
+        if service not in _tracers:
+            _tracers[service] = Tracer(service)
+        return _tracers[service]
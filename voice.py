@@ -1,30 +1,38 @@
 import os
-import subprocess
+import uuid
 import pygame
 import threading
 import time
-import random
 import re
 import queue
 import glob
-from voice_db import get_character_data, PIPER_DIR
+from collections import OrderedDict
+from voice_db import get_character_data
+from piper_engine import get_engine
+from audio_cache import AudioCache
+from audio_utils import pcm_to_array, wav_to_array, to_mixer_buffer, compute_envelope
+from tracing import get_tracer
 
-PIPER_EXE = os.path.join(PIPER_DIR, "piper.exe")
+MAX_JOBS = 200
+tracer = get_tracer("voice")
+ENVELOPE_FPS = 60
 
 class MarieVoice:
     def __init__(self, default_char="tachyon"):
         print(f"[AUDIO] Initializing Piper Engine...")
-        if not os.path.exists(PIPER_EXE):
-            raise FileNotFoundError("piper.exe not found!")
+        # Resident Piper voices shared by every request in this process
+        self.engine = get_engine()
 
         # Create a cache folder to avoid file conflicts
         self.cache_dir = os.path.join(os.path.dirname(__file__), "cache")
         os.makedirs(self.cache_dir, exist_ok=True)
         self._clear_cache()
+        # Finished audio keyed by text + voice settings; survives restarts
+        self.audio_cache = AudioCache(os.path.join(self.cache_dir, "audio"))
 
         # Audio System
         try:
-            # Init mixer with standard settings; Sound() handles resampling automatically
+            # Init mixer with standard settings; buffers are converted to its format in play_audio
             pygame.mixer.init()
             # We use a dedicated Channel for voice to separate it from potential SFX
             self.channel = pygame.mixer.Channel(0)
@@ -32,13 +40,28 @@ class MarieVoice:
             print(f"[AUDIO] Mixer Error: {e}")
 
         # Threading & Queues
+        # speech_queue holds text waiting for synthesis,
+        # playback_queue holds rendered audio waiting to be played.
         self.speech_queue = queue.Queue()
+        self.playback_queue = queue.Queue()
         self.is_running = True
         self.is_speaking = False
-        
+
+        # Job table for the HTTP API. stop() bumps the epoch so work queued
+        # before it is dropped instead of played.
+        self.jobs = OrderedDict()
+        self.jobs_lock = threading.Lock()
+        self.epoch = 0
+
+        # Optional hook: converter(samples, rate, char_data) -> (samples, rate), or None
+        # on failure (used for RVC). Only set it when conversion is actually available;
+        # it is part of the cache key.
+        self.converter = None
 
         self.worker_thread = threading.Thread(target=self._process_queue, daemon=True)
         self.worker_thread.start()
+        self.playback_thread = threading.Thread(target=self._playback_loop, daemon=True)
+        self.playback_thread.start()
 
         self.set_voice(default_char)
         print("[AUDIO] Engine Ready.")
@@ -48,20 +71,22 @@ class MarieVoice:
         self.char_data, self.model_path = get_character_data(char_id)
         self.current_name = self.char_data["name"]
         self.emotions = self.char_data["emotions"]
+        self.piper_model = self.char_data["piper_model"]
+        self.speaker_id = self.char_data.get("speaker_id", 0)
+        # Loads the voice into the pool once; switching back later is free
+        self.engine.get_voice(self.piper_model)
         print(f"[AUDIO] Voice set to: {self.current_name}")
 
     def _clear_cache(self):
-        """Cleans up old audio files on startup."""
+        """Cleans up leftover temp audio files on startup (the audio cache is kept)."""
         for f in glob.glob(os.path.join(self.cache_dir, "*.wav")):
             try: os.remove(f)
             except: pass
 
     def _warmup(self):
-        """Generates a dummy file to ensure Piper is ready."""
+        """Runs one tiny synthesis so the first real sentence is not slow."""
         try:
-            dummy_path = os.path.join(self.cache_dir, "warmup.wav")
-            subprocess.run([PIPER_EXE, "--model", self.model_path, "--output_file", dummy_path], 
-                         input=b".", stderr=subprocess.DEVNULL, stdout=subprocess.DEVNULL)
+            self.engine.synthesize(self.piper_model, ".", self.speaker_id)
         except Exception as e:
             print(f"[AUDIO] Warmup skipped: {e}")
 
@@ -83,127 +108,198 @@ class MarieVoice:
             
         return clean_text, target_speed
 
-    def speak(self, text, face_callback=None):
-        if not text.strip(): return
-        self.speech_queue.put((text, face_callback))
+    def speak(self, text, face_callback=None, trace_id=None):
+        """Queues text for synthesis and playback. Returns a job id right away."""
+        if not text or not text.strip(): return None
+        job_id = uuid.uuid4().hex[:12]
+        with self.jobs_lock:
+            self.jobs[job_id] = {"id": job_id, "text": text, "status": "queued", "trace_id": trace_id,
+                                 "created_at": time.time(), "started_at": None, "finished_at": None}
+            # Keep the job table small, old finished jobs are of no interest
+            while len(self.jobs) > MAX_JOBS:
+                self.jobs.popitem(last=False)
+            epoch = self.epoch
+        self.speech_queue.put((job_id, epoch, text, face_callback))
+        return job_id
+
+    def job_status(self, job_id):
+        with self.jobs_lock:
+            job = self.jobs.get(job_id)
+            return dict(job) if job else None
+
+    def _update_job(self, job_id, **fields):
+        with self.jobs_lock:
+            if job_id in self.jobs:
+                self.jobs[job_id].update(fields)
+
+    def _is_stale(self, epoch):
+        """True when stop() ran after this job was queued."""
+        return epoch != self.epoch
 
     def stop(self):
-        """Stops playback and clears pending sentences."""
-        with self.speech_queue.mutex:
-            self.speech_queue.queue.clear()
+        """Stops playback and cancels every pending sentence (barge-in)."""
+        with self.jobs_lock:
+            self.epoch += 1
+            for job in self.jobs.values():
+                if job["status"] in ("queued", "synthesizing", "ready", "playing"):
+                    job["status"] = "cancelled"
+                    job["finished_at"] = time.time()
+
+        for q in (self.speech_queue, self.playback_queue):
+            while True:
+                try:
+                    q.get_nowait()
+                    q.task_done()
+                except queue.Empty:
+                    break
         if self.channel:
             self.channel.stop()
         self.is_speaking = False
 
     def _process_queue(self):
-        """Main loop: pulls text, generates audio, and plays it sequentially."""
-        file_counter = 0
-        
+        """Synthesis stage: pulls text and renders audio ahead of playback.
+
+        While sentence 1 is playing, sentence 2 is already being generated.
+        """
         while self.is_running:
             try:
                 # Wait for next sentence
-                text, face_callback = self.speech_queue.get(timeout=1)
+                job_id, epoch, text, face_callback = self.speech_queue.get(timeout=1)
             except queue.Empty:
                 continue
             
-            self.is_speaking = True
-            
-            filename = f"sentence_{file_counter}.wav"
-            filepath = os.path.join(self.cache_dir, filename)
-            file_counter = (file_counter + 1) % 20 # Keep only 20 files max
-            
             try:
-                self._generate_and_play(text, filepath, face_callback)
+                if self._is_stale(epoch): continue
+                job = self.job_status(job_id) or {}
+                trace_id = job.get("trace_id")
+                tracer.record("speak_queue_wait", job.get("created_at", time.time()), time.time(),
+                              trace_id, job_id=job_id)
+                self._update_job(job_id, status="synthesizing")
+                with tracer.span("generate_only", trace_id, job_id=job_id):
+                    audio = self.generate_only(text)
+
+                # stop() may have run while we were synthesizing
+                if self._is_stale(epoch): continue
+                if audio:
+                    # Lip-sync data is published with the job so the GUI can follow playback
+                    samples, rate = audio
+                    self._update_job(job_id, status="ready",
+                                     duration=len(samples) / float(rate),
+                                     envelope_fps=ENVELOPE_FPS,
+                                     envelope=compute_envelope(samples, rate, ENVELOPE_FPS))
+                    self.playback_queue.put((job_id, epoch, audio, face_callback))
+                else:
+                    self._update_job(job_id, status="done", finished_at=time.time())
             except Exception as e:
                 print(f"[AUDIO ERROR] {e}")
+                self._update_job(job_id, status="error", error=str(e), finished_at=time.time())
             finally:
-                self.is_speaking = False
                 self.speech_queue.task_done()
 
-    def _generate_and_play(self, text, filepath, face_callback):
-        clean_text, speed = self._get_physics(text)
-        print(f"[{self.current_name.upper()}]: {clean_text}")
+    def _playback_loop(self):
+        """Playback stage: the dedicated audio thread, plays sentences back to back."""
+        while self.is_running:
+            try:
+                job_id, epoch, audio, face_callback = self.playback_queue.get(timeout=1)
+            except queue.Empty:
+                continue
 
-        length_scale = 1.0 / float(speed)
-        
-        # Prepare Piper Command
-        startupinfo = subprocess.STARTUPINFO()
-        startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-        
-        cmd = [
-            PIPER_EXE, 
-            "--model", self.model_path, 
-            "--output_file", filepath, 
-            "--length_scale", str(length_scale)
-        ]
-
-        # Generate Audio
-        proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, startupinfo=startupinfo)
-        proc.communicate(input=clean_text.encode('utf-8'))
-
-        # Playback
-        if os.path.exists(filepath):
             try:
-                # Load Sound into memory (Fixes file lock issues)
-                sound = pygame.mixer.Sound(filepath)
-                self.channel.play(sound)
-                
-                # Block thread until audio finishes (Prevents overlapping)
-                clock = pygame.time.Clock()
-                while self.channel.get_busy():
-                    # Check if app is closing
-                    if not self.is_running: 
-                        self.channel.stop()
-                        break
-                    
-                    # Optional: Manual mouth movement callback
-                    if face_callback:
-                        face_callback(random.uniform(0.3, 1.0))
-                    
-                    clock.tick(30)
-                
-            except pygame.error as e:
-                print(f"[PLAYBACK ERROR] {e}")
-            
-            # Small pause between sentences for natural flow
-            time.sleep(0.05)
-            
-    
+                if self._is_stale(epoch): continue
+                self.is_speaking = True
+                # started_at is the playback clock the GUI samples the envelope against
+                self._update_job(job_id, status="playing", started_at=time.time())
+                trace_id = (self.job_status(job_id) or {}).get("trace_id")
+                with tracer.span("play_audio", trace_id, job_id=job_id):
+                    self.play_audio(audio, face_callback)
+
+                if not self._is_stale(epoch):
+                    self._update_job(job_id, status="done", finished_at=time.time())
+                    # Small pause between sentences for natural flow
+                    time.sleep(0.05)
+            except Exception as e:
+                print(f"[AUDIO ERROR] {e}")
+                self._update_job(job_id, status="error", error=str(e), finished_at=time.time())
+            finally:
+                self.is_speaking = False
+                self.playback_queue.task_done()
+
     def generate_only(self, text):
-        """Generates WAV file using Piper but DOES NOT play it."""
+        """Renders text to (samples, sample_rate) but DOES NOT play it.
+
+        Audio stays in memory from Piper through the converter to playback.
+        Repeated phrases come straight from the audio cache and skip both
+        Piper and RVC.
+        """
         clean_text, speed = self._get_physics(text)
-        
-        filename = "temp_tts.wav"
-        filepath = os.path.join(self.cache_dir, filename)
-        
+        if not clean_text: return None
+        print(f"[{self.current_name.upper()}]: {clean_text}")
+
         length_scale = 1.0 / float(speed)
-        
-        startupinfo = subprocess.STARTUPINFO()
-        startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
 
-        cmd = [
-            PIPER_EXE, 
-            "--model", self.model_path, 
-            "--output_file", filepath, 
-            "--length_scale", str(length_scale)
-        ]
+        use_rvc = bool(self.converter and self.char_data.get("rvc_enable", False))
+        rvc_model = self.char_data.get("rvc_model") if use_rvc else None
+        pitch = self.char_data.get("pitch_shift", 0) if use_rvc else 0
+        key = AudioCache.make_key(clean_text, self.piper_model, self.speaker_id,
+                                  length_scale, rvc_model, pitch)
+
+        cached = self.audio_cache.get(key)
+        if cached is not None:
+            return cached
 
         try:
-            subprocess.run(cmd, input=clean_text.encode('utf-8'), 
-                           stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, startupinfo=startupinfo)
-            return filepath
+            # Generate Audio (voice is already resident, no model reload)
+            with tracer.span("piper_synthesize", chars=len(clean_text)):
+                pcm, rate = self.engine.synthesize(self.piper_model, clean_text, self.speaker_id, length_scale)
+            samples = pcm_to_array(pcm)
         except Exception as e:
             print(f"[PIPER ERROR] {e}")
             return None
 
+        if use_rvc:
+            converted = self.converter(samples, rate, self.char_data)
+            if converted is None:
+                # Play the raw voice this time, but don't cache it under the RVC key
+                return samples, rate
+            samples, rate = converted
+
+        self.audio_cache.put(key, samples, rate)
+        return samples, rate
+
+    def play_audio(self, audio, face_callback=None):
+        """Plays (samples, sample_rate) from memory and blocks until it finishes."""
+        samples, rate = audio
+        envelope = compute_envelope(samples, rate, ENVELOPE_FPS) if face_callback else None
+        try:
+            buffer = to_mixer_buffer(samples, rate, pygame.mixer.get_init())
+            sound = pygame.mixer.Sound(buffer=buffer)
+            self.channel.play(sound)
+            started = time.time()
+            
+            # Block thread until audio finishes (Prevents overlapping)
+            clock = pygame.time.Clock()
+            while self.channel.get_busy():
+                # Check if app is closing
+                if not self.is_running: 
+                    self.channel.stop()
+                    break
+                
+                # Optional: mouth movement callback driven by the audio envelope
+                if face_callback and envelope:
+                    frame = int((time.time() - started) * ENVELOPE_FPS)
+                    face_callback(envelope[min(frame, len(envelope) - 1)])
+                
+                clock.tick(30)
+            
+        except pygame.error as e:
+            print(f"[PLAYBACK ERROR] {e}")
+
     def play_file(self, filepath):
         """Plays any WAV file (Raw or RVC converted)."""
         if not os.path.exists(filepath): return
         
         try:
-            sound = pygame.mixer.Sound(filepath)
-            self.channel.play(sound)
-            while self.channel.get_busy():
-                pygame.time.Clock().tick(30)
+            with open(filepath, "rb") as f:
+                self.play_audio(wav_to_array(f.read()))
         except Exception as e:
-            print(f"[PLAY ERROR] {e}")        
\ No newline at end of file
+            print(f"[PLAY ERROR] {e}")
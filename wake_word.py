@@ -0,0 +1,145 @@
+import os
+import re
+import glob
+import numpy as np
+from stream_asr import SAMPLE_RATE
+
+WAKE_DIR = os.path.join(os.path.dirname(__file__), "cache", "wake")
+MAX_TEMPLATES = 5
+
+# Only the start of a phrase is searched for the wake word (seconds)
+SEARCH_WINDOW = 2.5
+
+# Normalised DTW distance that still counts as a match when only one template
+# exists. With two or more, the threshold is derived from how far apart they are.
+DEFAULT_THRESHOLD = 2.6
+
+
+def _mel_filterbank(n_mels, n_fft, rate):
+    def hz_to_mel(hz): return 2595.0 * np.log10(1.0 + hz / 700.0)
+    def mel_to_hz(mel): return 700.0 * (10 ** (mel / 2595.0) - 1.0)
+
+    mels = np.linspace(hz_to_mel(0), hz_to_mel(rate / 2), n_mels + 2)
+    bins = np.floor((n_fft + 1) * mel_to_hz(mels) / rate).astype(int)
+    fb = np.zeros((n_mels, n_fft // 2 + 1))
+    for m in range(1, n_mels + 1):
+        left, center, right = bins[m - 1], bins[m], bins[m + 1]
+        if center > left:
+            fb[m - 1, left:center] = (np.arange(left, center) - left) / (center - left)
+        if right > center:
+            fb[m - 1, center:right] = (right - np.arange(center, right)) / (right - center)
+    return fb
+
+
+_FILTERBANK = _mel_filterbank(26, 512, SAMPLE_RATE)
+_DCT = np.cos(np.pi / 26 * (np.arange(26)[None, :] + 0.5) * np.arange(13)[:, None])
+
+
+def mfcc(samples, frame_ms=25, hop_ms=10):
+    """13 MFCCs per 10 ms (c0 dropped), normalised per utterance (CMVN)."""
+    frame = SAMPLE_RATE * frame_ms // 1000
+    hop = SAMPLE_RATE * hop_ms // 1000
+    if len(samples) < frame:
+        samples = np.pad(samples, (0, frame - len(samples)))
+
+    emphasized = np.append(samples[0], samples[1:] - 0.97 * samples[:-1])
+    n_frames = 1 + (len(emphasized) - frame) // hop
+    idx = np.arange(frame)[None, :] + hop * np.arange(n_frames)[:, None]
+    frames = emphasized[idx] * np.hamming(frame)
+
+    power = np.abs(np.fft.rfft(frames, 512)) ** 2 / 512
+    log_mel = np.log(power @ _FILTERBANK.T + 1e-10)
+    coeffs = (log_mel @ _DCT.T)[:, 1:]
+    return (coeffs - coeffs.mean(axis=0)) / (coeffs.std(axis=0) + 1e-8)
+
+
+def subsequence_dtw(template, features):
+    """Best match of `template` anywhere inside `features`, per template frame."""
+    cost = np.sqrt(((template[:, None, :] - features[None, :, :]) ** 2).sum(axis=2))
+    n, m = cost.shape
+    # Free start: the template may begin at any frame of the phrase
+    prev = cost[0].tolist()
+    for i in range(1, n):
+        row = cost[i].tolist()
+        cur = [prev[0] + row[0]] + [0.0] * (m - 1)
+        for j in range(1, m):
+            cur[j] = row[j] + min(prev[j], prev[j - 1], cur[j - 1])
+        prev = cur
+    # Free end as well
+    return min(prev) / n
+
+
+class WakeWordDetector:
+    """First-stage wake-word spotter: MFCC templates matched with DTW.
+
+    Runs only on phrases the energy VAD already segmented, so silence costs
+    nothing and Whisper is only called once the wake word matched. Templates
+    are learned from the user's own voice: until there are any, Whisper
+    confirms the wake word and the matching audio is saved (enroll_from_phrase).
+    """
+
+    def __init__(self, wake_word, threshold=None):
+        self.wake_word = wake_word.lower()
+        self.template_dir = os.path.join(WAKE_DIR, re.sub(r"\W+", "_", self.wake_word))
+        os.makedirs(self.template_dir, exist_ok=True)
+        self.fixed_threshold = threshold or (float(os.environ["MARIE_WAKE_THRESHOLD"])
+                                             if os.environ.get("MARIE_WAKE_THRESHOLD") else None)
+        self.templates = [np.load(p) for p in sorted(glob.glob(os.path.join(self.template_dir, "*.npy")))]
+        self._update_threshold()
+
+    def ready(self):
+        return bool(self.templates)
+
+    def full(self):
+        return len(self.templates) >= MAX_TEMPLATES
+
+    def _update_threshold(self):
+        if self.fixed_threshold:
+            self.threshold = self.fixed_threshold
+        elif len(self.templates) >= 2:
+            pairs = [subsequence_dtw(a, b) for i, a in enumerate(self.templates)
+                     for b in self.templates[i + 1:]]
+            self.threshold = max(DEFAULT_THRESHOLD * 0.75, 1.3 * float(np.mean(pairs)))
+        else:
+            self.threshold = DEFAULT_THRESHOLD
+
+    def detect(self, samples):
+        """True if the start of this phrase sounds like the wake word."""
+        if not self.templates:
+            return True
+        window = samples[:int(SEARCH_WINDOW * SAMPLE_RATE)]
+        features = mfcc(window)
+        best = min(subsequence_dtw(t, features) for t in self.templates)
+        return best <= self.threshold
+
+    def enroll(self, samples):
+        """Stores one spoken example of the wake word."""
+        if len(self.templates) >= MAX_TEMPLATES:
+            return
+        template = mfcc(samples)
+        np.save(os.path.join(self.template_dir, f"template_{len(self.templates)}.npy"), template)
+        self.templates.append(template)
+        self._update_threshold()
+        print(f"[WAKE] Learned wake word sample {len(self.templates)}/{MAX_TEMPLATES}")
+
+    def enroll_from_phrase(self, model, samples):
+        """Cuts the wake word out of a phrase Whisper heard it in, and enrolls it.
+
+        Multi-word wake words ("hey marie") are matched as a run of
+        consecutive words and cut from the first word's start to the last's end.
+        """
+        target = re.findall(r"\w+", self.wake_word)
+        if not target:
+            return
+        segments, _ = model.transcribe(samples, beam_size=1, word_timestamps=True,
+                                       condition_on_previous_text=False)
+        words = [(re.sub(r"\W+", "", word.word.lower()), word.start, word.end)
+                 for segment in segments for word in segment.words or []]
+        for i in range(len(words) - len(target) + 1):
+            run = words[i:i + len(target)]
+            if [w for w, _, _ in run] == target:
+                start = max(0, int((run[0][1] - 0.05) * SAMPLE_RATE))
+                end = int((run[-1][2] + 0.05) * SAMPLE_RATE)
+                if end - start > SAMPLE_RATE // 10:
+                    self.enroll(samples[start:end])
+                return